@@ -0,0 +1,150 @@
+# benchmarks/bench_dedup.py
+"""
+Near-duplicate detection: rescans caught vs other documents wrongly matched.
+
+    python -m benchmarks.bench_dedup --forms 4 --names 3 --ocr-error 0.01
+
+Per document type, `--forms` one-page forms are generated, each filled in for
+`--names` different company names on the same template (same layout and
+filler, only the name line differs: the hard case). Every filled form is
+scanned twice: a first scan, stored in a temporary DocumentIndex, and a
+rescan (other noise, resolution and placement on the glass), looked up
+against it. A lookup must find its own first scan and nothing else.
+
+Scans have no text layer, so each scan's page-1 words come from its own
+simulated transcription pass: the form's text with every word misread (one
+character replaced) with probability `--ocr-error`. Two scans of one page
+therefore don't share every word, as with real OCR.
+
+Reported per type: dHash distance of rescans (max) and of same-template
+forms for other names (min); page-1 word similarity (word_similarity) of
+rescans (min) and of same-template forms for other names (max); rescans
+caught and wrong matches (must be 0) at the configured thresholds; and the
+values to configure: DEDUP_MAX_DISTANCE (largest rescan distance plus
+MARGIN) and DEDUP_MIN_WORD_SIMILARITY (just above the most similar other
+form, so no other document can match).
+"""
+import argparse
+import math
+import os
+import random
+import tempfile
+
+import fitz
+
+from ocr_service import dedup
+from ocr_service.classifier import DocumentType
+from ocr_service.config import DEDUP_MIN_WORD_SIMILARITY
+
+from .synthetic import make_filled_form, make_scan
+
+NAMES = ["شركة النور للتجارة", "شركة الأمل للمقاولات", "مؤسسة الفجر", "شركة السلام للصناعات",
+         "شركة المستقبل", "مؤسسة الرواد", "شركة الشروق", "شركة الوفاء للاستيراد"]
+MARGIN = 2      # bits above the largest rescan distance seen
+_MISREAD = "ابتثجحخدذرزسشصضطظعغفقكلمنهوي0123456789"
+
+
+def transcribe(text: str, rng: random.Random, error_rate: float) -> str:
+    """
+    One simulated OCR pass: each word misread (one character replaced) with
+    probability `error_rate`.
+    """
+    words = []
+    for word in text.split():
+        if rng.random() < error_rate:
+            k = rng.randrange(len(word))
+            word = word[:k] + rng.choice(_MISREAD) + word[k + 1:]
+        words.append(word)
+    return " ".join(words)
+
+
+def scanned(tmp: str, doc_type: DocumentType, form: int, name: int,
+            error_rate: float) -> tuple[dedup.Fingerprint, ...]:
+    """
+    Fingerprints of the first scan and the rescan of one filled form, each
+    with page-1 words from a transcription pass of its own.
+    """
+    src = os.path.join(tmp, f"{doc_type.name}_{form}_{name}.pdf")
+    make_filled_form(src, doc_type, NAMES[name], seed=form)
+    with fitz.open(src) as doc:
+        text = doc[0].get_text()
+    fps = []
+    for n, (dpi, offset) in enumerate(((100, 0.0), (120, 3.0))):
+        seed = form * 100 + name * 10 + n
+        scan = os.path.join(tmp, f"{doc_type.name}_{form}_{name}_scan{n}.pdf")
+        make_scan(src, scan, dpi=dpi, seed=seed, offset=offset)
+        fp = dedup.fingerprint(scan)
+        fp.page_words = dedup.text_signature(transcribe(text, random.Random(seed), error_rate))
+        fps.append(fp)
+    return tuple(fps)
+
+
+def run_type(tmp: str, doc_type: DocumentType, args) -> dict:
+    index = dedup.DocumentIndex(os.path.join(tmp, f"{doc_type.name}.sqlite3"))
+    pairs = {}
+    for form in range(args.forms):
+        for name in range(args.names):
+            first, rescan = scanned(tmp, doc_type, form, name, args.ocr_error)
+            doc_id = index.add(f"{form}_{name}", first, doc_type.name, {"form": form, "name": name})
+            pairs[doc_id] = (form, first, rescan)
+
+    rescan_d, other_d, rescan_sim, other_sim = [], [], [], []
+    caught = wrong = 0
+    for doc_id, (form, first, rescan) in pairs.items():
+        rescan_d.append(dedup.distance(first.page_hashes, rescan.page_hashes))
+        rescan_sim.append(dedup.word_similarity(first.page_words, rescan.page_words))
+        for other_id, (other_form, other, _) in pairs.items():
+            if other_id != doc_id:
+                d = dedup.distance(other.page_hashes, rescan.page_hashes)
+                if d is not None:
+                    other_d.append(d)
+                if other_form == form:      # same template, other name
+                    other_sim.append(dedup.word_similarity(other.page_words, rescan.page_words))
+        match = index.find_similar(rescan, min_word_similarity=args.min_similarity)
+        if match is None:
+            continue
+        if match["id"] == doc_id:
+            caught += 1
+        else:
+            wrong += 1
+    return {
+        "rescans": len(pairs),
+        "rescan_max": max(rescan_d),
+        "other_min": min(other_d) if other_d else None,
+        "rescan_sim_min": min(rescan_sim),
+        "other_sim_max": max(other_sim) if other_sim else 0.0,
+        "caught": caught,
+        "wrong": wrong,
+        "threshold": dedup.max_distance_for(doc_type.name),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--forms", type=int, default=4, help="templates (fillers) per type")
+    parser.add_argument("--names", type=int, default=3, help="names filled into each template")
+    parser.add_argument("--types", nargs="+", default=[t.name for t in DocumentType])
+    parser.add_argument("--ocr-error", type=float, default=0.01, help="chance a word is misread per pass")
+    parser.add_argument("--min-similarity", type=float, default=DEDUP_MIN_WORD_SIMILARITY)
+    args = parser.parse_args()
+    if not 2 <= args.names <= len(NAMES):
+        parser.error(f"--names must be 2..{len(NAMES)}")
+
+    print(f"{'':<24} {'dHash bits':^30} {'word similarity':^18}")
+    print(f"{'type':<24} {'threshold':>9} {'rescan max':>10} {'other min':>9} "
+          f"{'rescan min':>10} {'other max':>9} {'caught':>9} {'wrong':>6} {'bits':>5} {'similarity':>10}")
+    suggested = 0.0
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.types:
+            r = run_type(tmp, DocumentType[name], args)
+            other = "-" if r["other_min"] is None else str(r["other_min"])
+            similarity = math.floor(round(r["other_sim_max"] * 100, 6)) / 100 + 0.01
+            suggested = max(suggested, similarity)
+            print(f"{name:<24} {r['threshold']:9d} {r['rescan_max']:10d} {other:>9} "
+                  f"{r['rescan_sim_min']:10.3f} {r['other_sim_max']:9.3f} "
+                  f"{r['caught']:4d}/{r['rescans']:<4d} {r['wrong']:6d} {r['rescan_max'] + MARGIN:5d} {similarity:10.2f}")
+    print(f"DEDUP_MIN_WORD_SIMILARITY for every type: {suggested:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# benchmarks/bench_financial_summary.py
+"""
+Accuracy and latency of the local (text layer) financial summary parser.
+
+    python -m benchmarks.bench_financial_summary --fixtures path/to/fixtures
+    python -m benchmarks.bench_financial_summary --synthetic 50
+
+A fixture is a `name.pdf` with a `name.json` of expected field values next to
+it. Without --fixtures, synthetic one-page reports are generated, in turn
+plain, with a number on the total row under the bank table, with a page
+footer, and with both (neither may end up in the Finance List). Only the
+local parser runs (no Gemini calls); fields it can't fill are counted as
+"left to the LLM". Pass --with-llm to also time the full `extract_pdf` path.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from ocr_service.extractors.financial_summary import FIELDS, FinancialSummaryExtractor
+
+from .synthetic import make_financial_summary
+
+
+def load_fixtures(folder: str) -> list[tuple[str, dict]]:
+    fixtures = []
+    for pdf in sorted(glob.glob(os.path.join(folder, "*.pdf"))):
+        expected_path = os.path.splitext(pdf)[0] + ".json"
+        if os.path.exists(expected_path):
+            with open(expected_path, encoding="utf-8") as f:
+                fixtures.append((pdf, json.load(f)))
+    return fixtures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--fixtures", help="folder of name.pdf + name.json pairs")
+    parser.add_argument("--synthetic", type=int, default=30)
+    parser.add_argument("--with-llm", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    extractor = FinancialSummaryExtractor()
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.fixtures:
+            fixtures = load_fixtures(args.fixtures)
+        else:
+            rng = random.Random(args.seed)
+            fixtures = []
+            for n in range(args.synthetic):
+                path = os.path.join(tmp, f"summary_{n}.pdf")
+                fixtures.append((path, make_financial_summary(path, rng, total_row=n % 2 == 1,
+                                                              footer=n % 4 >= 2)))
+        if not fixtures:
+            raise SystemExit("no fixtures found")
+
+        correct = {k: 0 for k in FIELDS}
+        expected_count = {k: 0 for k in FIELDS}
+        missing = {k: 0 for k in FIELDS}
+        local_ms, full_s = [], []
+        for pdf, expected in fixtures:
+            t0 = time.perf_counter()
+            local = extractor.parse_local(pdf)
+            local_ms.append((time.perf_counter() - t0) * 1000)
+            for key in FIELDS:
+                if key not in local:
+                    missing[key] += 1
+                if key in expected:
+                    expected_count[key] += 1
+                    correct[key] += local.get(key) == expected[key]
+            if args.with_llm:
+                t0 = time.perf_counter()
+                extractor.extract_pdf(pdf)
+                full_s.append(time.perf_counter() - t0)
+
+    n = len(fixtures)
+    print(f"documents: {n}")
+    print(f"{'field':<18} {'local accuracy':>15} {'left to LLM':>12}")
+    for key in FIELDS:
+        acc = f"{correct[key] / expected_count[key]:.3f}" if expected_count[key] else "-"
+        print(f"{key:<18} {acc:>15} {missing[key] / n:>12.3f}")
+    print(f"local parse latency: p50 {statistics.median(local_ms):.1f} ms, max {max(local_ms):.1f} ms")
+    if full_s:
+        print(f"extract_pdf latency: p50 {statistics.median(full_s):.2f} s, max {max(full_s):.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# benchmarks/bench_fused.py
+"""
+Fused classification + page-1 OCR against the two-call path.
+
+    python -m benchmarks.bench_fused --documents 20 --pages 2 --latency 0.8
+
+Scanned synthetic documents are processed end to end against the fake
+backend (no quota spent) in both modes; reports model calls, page OCR
+calls, uploads and wall time per document. Near-duplicate detection and
+checkpoints are off so every run extracts.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from ocr_service import checkpoints, llm, pipeline
+from ocr_service.classifier import DocumentType
+from ocr_service.fake_backend import FakeClient, LongTailLatency
+
+from .synthetic import make_bundle, make_scan
+
+
+def run(paths: list[str], fused: bool, latency: float) -> dict:
+    client = FakeClient(latency=LongTailLatency(latency, tail_prob=0.0, seed=0), activation_s=0.0)
+    llm.set_client(client)
+    llm.reset_stats()
+    pipeline.FUSED_CLASSIFY_OCR = fused
+    walls = []
+    for path in paths:
+        start = time.perf_counter()
+        pipeline.process_document(path)
+        walls.append(time.perf_counter() - start)
+    return {
+        "calls": client.models.calls / len(paths),
+        "ocr": llm.report()["stages"].get("ocr", {}).get("calls", 0) / len(paths),
+        "uploads": client.files.uploads / len(paths),
+        "wall": statistics.median(walls),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.8, help="median seconds per model call")
+    args = parser.parse_args()
+
+    pipeline.DEDUP_ENABLED = False
+    checkpoints.CHECKPOINTS_ENABLED = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for n in range(args.documents):
+            digital = os.path.join(tmp, f"digital_{n}.pdf")
+            make_bundle(digital, [(DocumentType.FINANCIAL_SUMMARY, args.pages)], seed=n, filler=40)
+            paths.append(os.path.join(tmp, f"scan_{n}.pdf"))
+            make_scan(digital, paths[-1], seed=n)
+
+        print(f"{'mode':<9} {'calls/doc':>10} {'ocr/doc':>8} {'uploads/doc':>12} {'p50 s/doc':>10}")
+        for fused in (False, True):
+            r = run(paths, fused, args.latency)
+            print(f"{'fused' if fused else 'two-call':<9} {r['calls']:10.1f} {r['ocr']:8.1f} "
+                  f"{r['uploads']:12.1f} {r['wall']:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
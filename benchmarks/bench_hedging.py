@@ -0,0 +1,64 @@
+# benchmarks/bench_hedging.py
+"""
+Tail latency of model calls with and without request hedging.
+
+    python -m benchmarks.bench_hedging --calls 2000 --tail-prob 0.02 --tail-scale 20
+
+Runs against the fake backend's long-tail latency distribution (lognormal
+body, rare stalls), so no quota is spent. Delays are multiplied by
+--time-scale to keep the run short; reported latencies are unscaled.
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ocr_service import llm
+from ocr_service.fake_backend import FakeClient, LongTailLatency
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(calls: int, concurrency: int, time_scale: float) -> list[float]:
+    def one(_):
+        start = time.perf_counter()
+        llm.generate("bench", ["Extract all visible text."])
+        return (time.perf_counter() - start) / time_scale
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, range(calls)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--median", type=float, default=1.0)
+    parser.add_argument("--tail-prob", type=float, default=0.02)
+    parser.add_argument("--tail-scale", type=float, default=20.0)
+    parser.add_argument("--percentile", type=float, default=95)
+    parser.add_argument("--max-rate", type=float, default=0.05)
+    parser.add_argument("--time-scale", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7} {'hedged':>7} {'wins':>6}")
+    for enabled in (False, True):
+        latency = LongTailLatency(args.median, tail_prob=args.tail_prob,
+                                  tail_scale=args.tail_scale, seed=args.seed)
+        llm.set_client(FakeClient(latency=latency, time_scale=args.time_scale))
+        llm.reset_stats()
+        llm.set_hedging(enabled=enabled, percentile=args.percentile, max_rate=args.max_rate)
+        samples = run(args.calls, args.concurrency, args.time_scale)
+        hedge = llm.report()["hedging"]
+        print(f"{'hedged' if enabled else 'baseline':<10} "
+              f"{statistics.median(samples):7.2f} {percentile(samples, 95):7.2f} "
+              f"{percentile(samples, 99):7.2f} {max(samples):7.2f} "
+              f"{hedge['hedged']:7d} {hedge['hedge_wins']:6d}")
+
+
+if __name__ == "__main__":
+    main()
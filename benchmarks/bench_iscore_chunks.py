@@ -0,0 +1,114 @@
+# benchmarks/bench_iscore_chunks.py
+"""
+Long iScore reports: one prompt for the whole report vs chunked extraction.
+
+    python -m benchmarks.bench_iscore_chunks --facilities 10 40 120 250 --chars-per-s 400
+
+Synthetic company reports with `--facilities` facility tables are extracted
+by ScoreCompanyExtractor against the fake backend. The fake model answers
+after a fixed latency plus the time to write its answer at `--chars-per-s`,
+and cuts answers longer than `--max-output-chars` (an output-token limit), so
+a long report is slow in each serial step and its JSON can come back
+truncated. Reported: wall time, model calls, facilities extracted, and
+whether the facility count matches the credit summary.
+"""
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+
+from ocr_service import llm
+from ocr_service.extractors import iscore_base, iscore_company
+from ocr_service.extractors.iscore_chunks import facility_heading
+from ocr_service.fake_backend import FakeClient, LongTailLatency
+
+from .synthetic import make_iscore_report
+
+
+def _facility(i: int) -> dict:
+    return {"facility_index": i, "facility_code": f"{1000 + i}", "facility_type": "حساب جاري مدين",
+            "credit_limit": f"{10000 * i}", "bank_code": f"B{i % 90 + 10}"}
+
+
+def make_responder(total: int, chars_per_s: float, max_chars: int, time_scale: float):
+    """
+    Answers the iScore prompts from the report text they carry, taking time
+    in proportion to the answer's length.
+    """
+    def headings(text: str) -> list[int]:
+        return [i for i in map(facility_heading, text.splitlines()) if i is not None]
+
+    def respond(model: str, contents: list) -> str:
+        prompt = "\n".join(c for c in contents if isinstance(c, str))
+        if "Facility Tables:" in prompt:
+            out = json.dumps({"facilities": [_facility(i) for i in headings(prompt)]}, ensure_ascii=False)
+        elif "Full Report Text:" in prompt:
+            out = "\n".join(["Report Number: 1", f"Number of Facilities: {total}"] +
+                            [f"Facility {i}: {json.dumps(_facility(i), ensure_ascii=False)}"
+                             for i in headings(prompt)])
+        elif "Raw Lines:" in prompt:
+            indices = [int(i) for i in re.findall(r"^Facility (\d+):", prompt, flags=re.M)]
+            out = json.dumps({
+                "report_number": "1", "profile": {}, "identity_data": {}, "company_profile": {},
+                "business_risk_summary": {}, "credit_summary": {"number_of_facilities": total},
+                "facilities": [_facility(i) for i in indices],
+            }, ensure_ascii=False)
+        elif "Here is the JSON extracted:" in prompt:
+            out = prompt.split("Here is the JSON extracted:", 1)[1].split("\nPlease:", 1)[0].strip()
+        else:
+            out = "{}"
+        out = out[:max_chars]
+        time.sleep(len(out) / chars_per_s * time_scale)
+        return out
+
+    return respond
+
+
+def run(pdf_path: str, facilities: int, chunked: bool, args) -> dict:
+    client = FakeClient(latency=LongTailLatency(args.latency, sigma=0.0, tail_prob=0.0),
+                        responder=make_responder(facilities, args.chars_per_s, args.max_output_chars,
+                                                 args.time_scale),
+                        time_scale=args.time_scale)
+    llm.set_client(client)
+    iscore_base.ISCORE_CHUNKING_ENABLED = chunked
+    start = time.perf_counter()
+    try:
+        data = iscore_company.ScoreCompanyExtractor().extract(pdf_path)
+    except ValueError as e:          # truncated JSON on every tier
+        return {"wall": time.perf_counter() - start, "calls": client.models.calls,
+                "extracted": 0, "consistent": f"failed ({type(e).__name__})"}
+    wall = time.perf_counter() - start
+    check = data.get("_meta", {}).get("facility_check", {})
+    return {
+        "wall": wall,
+        "calls": client.models.calls,
+        "extracted": len(data.get("facilities", [])),
+        "consistent": check.get("consistent",
+                                len(data.get("facilities", [])) == facilities),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--facilities", type=int, nargs="+", default=[10, 40, 120, 250])
+    parser.add_argument("--latency", type=float, default=1.0, help="fixed latency per call (s)")
+    parser.add_argument("--chars-per-s", type=float, default=400, help="speed of writing the answer")
+    parser.add_argument("--max-output-chars", type=int, default=30000)
+    parser.add_argument("--time-scale", type=float, default=0.02, help="multiplier on every fake delay")
+    args = parser.parse_args()
+
+    print(f"{'facilities':>10} {'mode':<8} {'wall (s)':>9} {'calls':>6} {'extracted':>10} {'count ok':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.facilities:
+            pdf_path = os.path.join(tmp, f"iscore_{n}.pdf")
+            make_iscore_report(pdf_path, n, seed=n)
+            for chunked in (False, True):
+                r = run(pdf_path, n, chunked, args)
+                print(f"{n:10d} {'chunked' if chunked else 'single':<8} {r['wall']:9.2f} {r['calls']:6d} "
+                      f"{r['extracted']:10d} {str(r['consistent']):>9}")
+
+
+if __name__ == "__main__":
+    main()
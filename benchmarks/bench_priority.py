@@ -0,0 +1,106 @@
+# benchmarks/bench_priority.py
+"""
+Interactive latency under a batch flood: no scheduler, FIFO, weighted priority.
+
+    python -m benchmarks.bench_priority --batch-clients 32 --requests 20 --rpm 600
+
+`--batch-clients` threads issue model calls back to back as the "batch"
+class while an "interactive" client sends `--requests` requests of
+`--calls` sequential calls each, one every `--gap` seconds. All calls go
+through llm.generate to the fake backend, whose blocking per-minute quota
+is the shared bottleneck. Modes:
+  off        no scheduler: every call queues on the quota directly
+  fifo       scheduler, equal weights, no reserved slots (first come, first served)
+  priority   scheduler with config's weights, reserved slots and starvation guard
+The scheduler gets `--capacity` slots, by default sized from the quota
+(scheduler.capacity_for); pass config.MAX_INFLIGHT_CALLS to see a
+capacity below the quota cap batch throughput.
+"""
+import argparse
+import math
+import threading
+import time
+
+from ocr_service import llm
+from ocr_service.fake_backend import FakeClient, LongTailLatency
+from ocr_service.scheduler import Scheduler, capacity_for, priority
+
+
+def run(mode: str, args) -> dict:
+    client = FakeClient(latency=LongTailLatency(args.latency), rpm=args.rpm, block_on_quota=True,
+                        time_scale=args.time_scale)
+    llm.set_client(client)
+    llm.SCHEDULER_ENABLED = mode != "off"
+    if mode == "fifo":
+        llm.scheduler = Scheduler(args.capacity, weights={"interactive": 1, "batch": 1}, reserved={},
+                                  starvation_s=math.inf)
+    else:
+        llm.scheduler = Scheduler(args.capacity)
+
+    stop = threading.Event()
+    batch_calls = 0
+    lock = threading.Lock()
+
+    def batch():
+        nonlocal batch_calls
+        with priority("batch"):
+            while not stop.is_set():
+                llm.generate("ocr", ["Transcribe this page."])
+                with lock:
+                    batch_calls += 1
+
+    threads = [threading.Thread(target=batch, daemon=True) for _ in range(args.batch_clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(args.gap)                # let the flood build up
+
+    latencies = []
+    with priority("interactive"):
+        for _ in range(args.requests):
+            t0 = time.perf_counter()
+            for _ in range(args.calls):
+                llm.generate("ocr", ["Transcribe this page."])
+            latencies.append(time.perf_counter() - t0)
+            time.sleep(args.gap)
+    stop.set()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[min(len(latencies) - 1, math.ceil(0.95 * len(latencies)) - 1)],
+        "batch_per_s": batch_calls / wall,
+        "stats": llm.scheduler.stats() if mode != "off" else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--calls", type=int, default=4, help="model calls per interactive request")
+    parser.add_argument("--gap", type=float, default=0.2, help="seconds between interactive requests")
+    parser.add_argument("--latency", type=float, default=1.0, help="median model call latency (s)")
+    parser.add_argument("--rpm", type=int, default=600)
+    parser.add_argument("--time-scale", type=float, default=0.05, help="multiplier on every fake delay")
+    parser.add_argument("--capacity", type=int, default=None,
+                        help="scheduler slots (default: capacity_for(rpm, latency))")
+    args = parser.parse_args()
+    args.capacity = args.capacity or capacity_for(args.rpm, args.latency)
+    print(f"scheduler capacity: {args.capacity}")
+
+    print(f"{'mode':<9} {'interactive p50 (s)':>20} {'p95 (s)':>8} {'batch calls/s':>14} "
+          f"{'wait interactive (s)':>21} {'wait batch (s)':>15}")
+    for mode in ("off", "fifo", "priority"):
+        r = run(mode, args)
+        waits = ("-", "-")
+        if r["stats"]:
+            waits = (f"{r['stats']['interactive']['mean_wait_s']:.3f}", f"{r['stats']['batch']['mean_wait_s']:.3f}")
+        print(f"{mode:<9} {r['p50']:20.2f} {r['p95']:8.2f} {r['batch_per_s']:14.1f} {waits[0]:>21} {waits[1]:>15}")
+
+
+if __name__ == "__main__":
+    main()
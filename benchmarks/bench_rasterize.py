@@ -0,0 +1,65 @@
+# benchmarks/bench_rasterize.py
+"""
+Pages rendered per second against the number of rasterizer processes.
+
+    python -m benchmarks.bench_rasterize --pages 100 --dpi 300 --workers 1 2 4 8
+
+A synthetic `--pages` scan (image-only pages, like a real scanned report) is
+rendered to JPEG at `--dpi` through `iter_rendered`, once per worker count.
+1 renders in the calling process (the previous behaviour); larger counts use
+a process pool, warmed up before timing, so the numbers exclude the one-off
+cost of starting the workers (reported separately).
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from ocr_service.classifier import DocumentType
+from ocr_service.utils import rasterizer
+
+from .synthetic import make_bundle, make_scan
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--digital", action="store_true", help="render the text PDF instead of a scan")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "report.pdf")
+        make_bundle(pdf_path, [(DocumentType.ISCORE_COMPANY, args.pages)], filler=40)
+        if not args.digital:
+            scan = os.path.join(tmp, "scan.pdf")
+            make_scan(pdf_path, scan)
+            pdf_path = scan
+        pages = range(args.pages)
+
+        print(f"cores: {os.cpu_count()}")
+        print(f"{'workers':>7} {'startup (s)':>12} {'wall (s)':>9} {'pages/s':>8} {'speedup':>8}")
+        baseline = None
+        for workers in args.workers:
+            out = os.path.join(tmp, f"out_{workers}")
+            os.makedirs(out)
+            start = time.perf_counter()
+            if workers > 1:     # start the processes before timing
+                list(rasterizer.iter_rendered(pdf_path, range(rasterizer.RASTER_MIN_PAGES), out,
+                                              dpi=36, workers=workers))
+            startup = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for _ in rasterizer.iter_rendered(pdf_path, pages, out, args.dpi, workers=workers):
+                pass
+            wall = time.perf_counter() - start
+            rate = args.pages / wall
+            baseline = baseline or rate
+            print(f"{workers:7d} {startup:12.2f} {wall:9.2f} {rate:8.1f} {rate / baseline:7.2f}x")
+            rasterizer.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# benchmarks/bench_segmentation.py
+"""
+Offline accuracy and latency benchmark for multi-document bundle splitting.
+
+    python -m benchmarks.bench_segmentation --bundles 50 --extract-latency 0.5 --scanned
+
+Synthetic bundles are generated with a text layer, so page labelling runs
+fully locally. Extraction is replaced by a stub that sleeps for
+`--extract-latency` seconds per segment, to compare serial and parallel
+per-segment extraction without calling Gemini.
+
+`--repeat-rate` makes a document follow another of the same type (types
+with a first-page title only), which must still come out as two segments.
+
+With `--scanned`, every bundle is also run as an image-only scan (make_scan):
+each page is then rendered as a SEGMENT_CLASSIFY_DPI thumbnail and labelled
+by classify_image against the fake backend. The fake model labels what the
+thumbnail shows: the type whose reference first page (scanned and rendered
+the same way) has the nearest heading band, or CONTINUATION when a page
+without heading is nearer.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import fitz
+
+from ocr_service import llm
+from ocr_service.classifier import CONTINUATION, DocumentType
+from ocr_service.config import SEGMENT_CLASSIFY_DPI
+from ocr_service.fake_backend import FakeClient, FakeFile, LongTailLatency, default_responder
+from ocr_service.pipeline import process_bundle
+from ocr_service.segmentation import FIRST_PAGE_HEADINGS, group_segments, label_pages
+
+from .synthetic import first_pages, make_bundle, make_scan, random_parts
+
+
+def _stub_extractor(latency: float):
+    def extract(pdf_path, doc_type, checkpoint=None, images_folder=None):
+        time.sleep(latency)
+        return {"document_type": doc_type.name}
+    return extract
+
+
+def _heading_band(image_path: str) -> bytes:
+    """
+    The top of a page image (where the synthetic headings are), in gray,
+    as rendered at SEGMENT_CLASSIFY_DPI.
+    """
+    pix = fitz.Pixmap(image_path)
+    if pix.n != 1:
+        pix = fitz.Pixmap(fitz.csGRAY, pix)
+    scale = pix.width / 612                      # pixels per point
+    top, bottom = int(58 * scale), int(120 * scale)
+    return pix.samples[top * pix.stride:bottom * pix.stride]
+
+
+def _distance(a: bytes, b: bytes) -> float:
+    n = min(len(a), len(b))
+    return sum(abs(x - y) for x, y in zip(a[:n], b[:n])) / max(n, 1)
+
+
+class ThumbnailReader:
+    """
+    Fake vision model for classification prompts: nearest reference heading
+    band; a page closer to a continuation page than to any heading gets
+    CONTINUATION. Other prompts get the default fake answers.
+    """
+
+    def __init__(self, folder: str):
+        self.references: list[tuple[str | None, bytes]] = []
+        for n, doc_type in enumerate(list(DocumentType) + [None]):
+            pdf = os.path.join(folder, f"ref_{n}.pdf")
+            # A second page stands for the continuation pages.
+            make_bundle(pdf, [(doc_type or DocumentType.NATIONAL_ID, 2)], seed=10_000 + n)
+            scan = os.path.join(folder, f"ref_{n}_scan.pdf")
+            make_scan(pdf, scan, seed=n)
+            page = 1 if doc_type is None else 0
+            with fitz.open(scan) as doc:
+                path = os.path.join(folder, f"ref_{n}.jpg")
+                doc[page].get_pixmap(dpi=SEGMENT_CLASSIFY_DPI).save(path)
+            self.references.append((doc_type.name if doc_type else None, _heading_band(path)))
+
+    def label(self, band: bytes) -> str:
+        label, _ = min(self.references, key=lambda ref: _distance(band, ref[1]))
+        return label or CONTINUATION
+
+    def __call__(self, model: str, contents: list) -> str:
+        prompt = "\n".join(c for c in contents if isinstance(c, str))
+        files = [c for c in contents if isinstance(c, FakeFile)]
+        if files and "Choose exactly one of" in prompt:
+            return self.label(files[0].band)
+        return default_responder(model, contents)
+
+
+def fake_vision_client(reader: ThumbnailReader, latency: float) -> FakeClient:
+    """
+    A fake backend whose uploads keep the heading band of the image, so the
+    reader can look at it (uploads are reused after the file is deleted).
+    """
+    client = FakeClient(latency=LongTailLatency(latency), responder=reader, activation_s=0.0)
+    upload = client.files.upload
+
+    def keep_band(file, config=None):
+        f = upload(file, config)
+        f.band = _heading_band(str(file))
+        return f
+    client.files.upload = keep_band
+    return client
+
+
+def evaluate(bundles: list[tuple[str, list[DocumentType], list[bool]]], args,
+             client: FakeClient | None = None) -> dict:
+    pages_total = pages_correct = bundles_exact = calls = 0
+    firsts_total = firsts_correct = 0
+    segment_ms, serial_s, parallel_s = [], [], []
+    for path, truth, truth_starts in bundles:
+        calls_before = client.models.calls if client else 0
+        t0 = time.perf_counter()
+        labels, starts = label_pages(path)
+        segments = group_segments(labels, starts)
+        segment_ms.append((time.perf_counter() - t0) * 1000)
+        calls += (client.models.calls if client else 0) - calls_before
+
+        firsts = [i for i, first in enumerate(truth_starts) if first]
+        firsts_total += len(firsts)
+        firsts_correct += sum(labels[i] == truth[i] for i in firsts)
+
+        predicted = [None] * len(truth)
+        for seg in segments:
+            for p in seg.pages:
+                predicted[p] = seg.doc_type
+        pages_total += len(truth)
+        pages_correct += sum(p == t for p, t in zip(predicted, truth))
+        expected = group_segments(truth, truth_starts)
+        bundles_exact += [(s.doc_type, s.pages) for s in segments] == [(s.doc_type, s.pages) for s in expected]
+
+        stub = _stub_extractor(args.extract_latency)
+        for workers, bucket in ((1, serial_s), (args.workers, parallel_s)):
+            t0 = time.perf_counter()
+            process_bundle(path, max_workers=workers, extract_fn=stub)
+            bucket.append(time.perf_counter() - t0)
+    return {
+        "pages_total": pages_total,
+        "pages_correct": pages_correct,
+        "firsts_total": firsts_total,
+        "firsts_correct": firsts_correct,
+        "exact_rate": bundles_exact / len(bundles),
+        "calls": calls,
+        "segment_ms": segment_ms,
+        "serial_s": serial_s,
+        "parallel_s": parallel_s,
+    }
+
+
+def report(title: str, r: dict, args) -> None:
+    print(f"{title}")
+    print(f"  page accuracy:           {r['pages_correct'] / r['pages_total']:.3f} "
+          f"({r['pages_correct']}/{r['pages_total']})")
+    print(f"  first-page labels:       {r['firsts_correct'] / r['firsts_total']:.3f} "
+          f"({r['firsts_correct']}/{r['firsts_total']})")
+    print(f"  exact segmentation rate: {r['exact_rate']:.3f}")
+    print(f"  segmentation latency:    p50 {statistics.median(r['segment_ms']):.1f} ms, "
+          f"max {max(r['segment_ms']):.1f} ms")
+    print(f"  bundle wall time:        serial p50 {statistics.median(r['serial_s']):.2f} s, "
+          f"parallel({args.workers}) p50 {statistics.median(r['parallel_s']):.2f} s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bundles", type=int, default=30)
+    parser.add_argument("--max-parts", type=int, default=4)
+    parser.add_argument("--max-pages", type=int, default=4)
+    parser.add_argument("--extract-latency", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat-rate", type=float, default=0.3,
+                        help="chance a document follows one of the same type")
+    parser.add_argument("--scanned", action="store_true", help="also run every bundle as a scan")
+    parser.add_argument("--classify-latency", type=float, default=0.05,
+                        help="median fake model latency per thumbnail (s)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        digital, scanned = [], []
+        for n in range(args.bundles):
+            path = os.path.join(tmp, f"bundle_{n}.pdf")
+            parts = random_parts(rng, args.max_parts, args.max_pages, args.repeat_rate,
+                                 repeatable=tuple(FIRST_PAGE_HEADINGS))
+            truth = make_bundle(path, parts, seed=n)
+            digital.append((path, truth, first_pages(parts)))
+            if args.scanned:
+                scan = os.path.join(tmp, f"scan_{n}.pdf")
+                make_scan(path, scan, seed=n)
+                scanned.append((scan, truth, first_pages(parts)))
+
+        print(f"bundles: {args.bundles}")
+        report("text layer", evaluate(digital, args), args)
+        if scanned:
+            client = fake_vision_client(ThumbnailReader(tmp), args.classify_latency)
+            llm.set_client(client)
+            r = evaluate(scanned, args, client)
+            report("scanned", r, args)
+            print(f"  classification calls:    {r['calls'] / r['pages_total']:.2f} per page, "
+                  f"{client.files.bytes_uploaded / client.files.uploads / 1e3:.1f} KB per thumbnail")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# benchmarks/bench_uploads.py
+"""
+Uploads and bytes sent with and without the uploaded-file registry.
+
+    python -m benchmarks.bench_uploads --documents 10 --pages 3 --resubmit 1
+
+Scanned synthetic documents are processed end to end against the fake
+backend's file service, then re-submitted `--resubmit` times (near-duplicate
+detection and checkpoints are off, so every run re-extracts). With the
+registry, page 1 is uploaded once for classification and OCR, re-submitted
+pages reuse their uploads, and a final sweep deletes everything idle.
+"""
+import argparse
+import os
+import tempfile
+
+from ocr_service import checkpoints, llm, pipeline
+from ocr_service.classifier import DocumentType
+from ocr_service.fake_backend import FakeClient
+
+from .synthetic import make_bundle, make_scan
+
+
+def run(paths: list[str], resubmit: int, reuse: bool) -> dict:
+    client = FakeClient(time_scale=0.001, activation_s=0.0)
+    llm.set_client(client)
+    llm.FILE_REUSE_ENABLED = reuse
+    for _ in range(1 + resubmit):
+        for path in paths:
+            pipeline.process_document(path)
+    stats = llm.files.stats()
+    keep_s, llm.files.keep_s = llm.files.keep_s, 0
+    llm.files.sweep()
+    llm.files.keep_s = keep_s
+    return {
+        "uploads": client.files.uploads,
+        "mb_uploaded": client.files.bytes_uploaded / 1e6,
+        "mb_saved": stats["bytes_saved"] / 1e6,
+        "left_remote": len(client.files.list()),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--resubmit", type=int, default=1)
+    args = parser.parse_args()
+
+    pipeline.DEDUP_ENABLED = False
+    checkpoints.CHECKPOINTS_ENABLED = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for n in range(args.documents):
+            digital = os.path.join(tmp, f"digital_{n}.pdf")
+            make_bundle(digital, [(DocumentType.FINANCIAL_SUMMARY, args.pages)], seed=n, filler=40)
+            paths.append(os.path.join(tmp, f"scan_{n}.pdf"))
+            make_scan(digital, paths[-1], seed=n)
+
+        print(f"{'registry':<9} {'uploads':>8} {'MB sent':>8} {'MB saved':>9} {'left remote':>12}")
+        for reuse in (False, True):
+            r = run(paths, args.resubmit, reuse)
+            print(f"{'on' if reuse else 'off':<9} {r['uploads']:8d} {r['mb_uploaded']:8.2f} "
+                  f"{r['mb_saved']:9.2f} {r['left_remote']:12d}")
+
+
+if __name__ == "__main__":
+    main()
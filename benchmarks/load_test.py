@@ -0,0 +1,215 @@
+# benchmarks/load_test.py
+"""
+End-to-end load generator: throughput, latency and resources vs concurrency.
+
+    python -m benchmarks.load_test --documents 24 --concurrency 1 2 4 8 16 --rpm 300
+
+A mixed corpus (every document type, digital and scanned) is processed by
+`process_document` from N client threads at each concurrency level, against
+the fake backend (long-tail latency, a blocking per-minute quota). Pages are
+rendered and fingerprinted for real, so CPU and memory are the service's own.
+Per level it reports throughput, p50/p95/p99 latency, CPU cores used, peak
+RSS and time spent waiting for quota, then the per-document time of each
+stage and queue (see ocr_service.metrics). Near-duplicate detection and
+checkpoints are off so every document is processed in full.
+"""
+import argparse
+import contextvars
+import csv
+import math
+import os
+import queue
+import resource
+import tempfile
+import threading
+import time
+
+from ocr_service import checkpoints, llm, metrics, pipeline
+from ocr_service.classifier import DocumentType
+from ocr_service.fake_backend import FakeClient, FakeFiles, LongTailLatency
+
+from .synthetic import make_bundle, make_scan
+
+PAGES = {
+    DocumentType.NATIONAL_ID: 1,
+    DocumentType.TAX_CARD: 1,
+    DocumentType.COMMERCIAL_REGISTRATION: 2,
+    DocumentType.FINANCIAL_SUMMARY: 2,
+    DocumentType.ISCORE_COMPANY: 4,
+    DocumentType.ISCORE_INDIVIDUAL: 3,
+}
+STAGES = ["fingerprint", "classify", "render", "upload", "queue_wait.interactive",
+          "page_queue.renderer_blocked", "page_queue.ocr_idle"]
+
+_doc_type: contextvars.ContextVar[str] = contextvars.ContextVar("doc_type", default="FINANCIAL_SUMMARY")
+
+
+def label_uploads(files: FakeFiles) -> None:
+    """
+    The fake classifier answers from the uploaded file's name; prefix every
+    upload with the true type of the document being processed.
+    """
+    upload = files.upload
+
+    def labelled(file, config=None):
+        f = upload(file, config)
+        f.display_name = f"{_doc_type.get()}_{f.display_name}"
+        return f
+    files.upload = labelled
+
+
+def make_corpus(folder: str, n: int) -> list[tuple[str, DocumentType]]:
+    """
+    `n` documents cycling through the types; every other one is a scan.
+    """
+    types = list(PAGES)
+    corpus = []
+    for i in range(n):
+        doc_type = types[i % len(types)]
+        path = os.path.join(folder, f"doc_{i}.pdf")
+        make_bundle(path, [(doc_type, PAGES[doc_type])], seed=i, filler=40)
+        if i % 2:
+            scan = os.path.join(folder, f"scan_{i}.pdf")
+            make_scan(path, scan, seed=i)
+            path = scan
+        corpus.append((path, doc_type))
+    return corpus
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Nearest-rank percentile (q in 0..100).
+    """
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3    # peak so far (KB on Linux)
+
+
+class _RssSampler(threading.Thread):
+    def __init__(self, interval_s: float = 0.1):
+        super().__init__(name="rss-sampler", daemon=True)
+        self.interval_s = interval_s
+        self.peak_mb = _rss_mb()
+        self._halt = threading.Event()
+
+    def run(self) -> None:
+        while not self._halt.wait(self.interval_s):
+            self.peak_mb = max(self.peak_mb, _rss_mb())
+
+    def stop(self) -> float:
+        self._halt.set()
+        self.join()
+        return self.peak_mb
+
+
+def run_level(corpus: list[tuple[str, DocumentType]], concurrency: int, args) -> dict:
+    client = FakeClient(latency=LongTailLatency(args.latency), rpm=args.rpm, block_on_quota=True,
+                        time_scale=args.time_scale, activation_s=0.0)
+    label_uploads(client.files)
+    llm.set_client(client)
+    metrics.reset()
+
+    jobs: queue.Queue = queue.Queue()
+    for item in corpus:
+        jobs.put(item)
+    latencies: list[float] = []
+    errors: list[str] = []
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                path, doc_type = jobs.get_nowait()
+            except queue.Empty:
+                return
+            _doc_type.set(doc_type.name)
+            start = time.perf_counter()
+            try:
+                pipeline.process_document(path)
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                with lock:
+                    errors.append(f"{doc_type.name}: {e!r}")
+
+    sampler = _RssSampler()
+    sampler.start()
+    cpu_start, wall_start = os.times(), time.perf_counter()
+    threads = [threading.Thread(target=contextvars.copy_context().run, args=(worker,))
+               for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall_start
+    cpu_end = os.times()
+    cpu = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+
+    done = len(latencies)
+    stages = metrics.snapshot()
+    return {
+        "concurrency": concurrency,
+        "documents": done,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else "",
+        "docs_per_s": done / wall,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "cpu_cores": cpu / wall,
+        "peak_rss_mb": sampler.stop(),
+        "quota_wait_s": client.quota.waited_s if client.quota else 0.0,
+        **{f"{name}_s_per_doc": stages.get(name, {}).get("total_s", 0.0) / max(done, 1) for name in STAGES},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--documents", type=int, default=24, help="documents processed at each level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--latency", type=float, default=1.0, help="median model call latency (s)")
+    parser.add_argument("--rpm", type=int, default=None, help="model calls per minute (default: unlimited)")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="multiplier on every fake delay")
+    parser.add_argument("--csv", help="also write the rows to this CSV file")
+    args = parser.parse_args()
+
+    pipeline.DEDUP_ENABLED = False
+    checkpoints.CHECKPOINTS_ENABLED = False
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = make_corpus(tmp, args.documents)
+        print(f"{'clients':>7} {'docs':>5} {'errors':>6} {'docs/s':>7} {'p50 (s)':>8} {'p95 (s)':>8} "
+              f"{'p99 (s)':>8} {'cores':>6} {'RSS MB':>7} {'quota wait (s)':>15}")
+        for concurrency in args.concurrency:
+            r = run_level(corpus, concurrency, args)
+            rows.append(r)
+            print(f"{r['concurrency']:7d} {r['documents']:5d} {r['errors']:6d} {r['docs_per_s']:7.2f} "
+                  f"{r['p50_s']:8.2f} {r['p95_s']:8.2f} {r['p99_s']:8.2f} {r['cpu_cores']:6.2f} "
+                  f"{r['peak_rss_mb']:7.0f} {r['quota_wait_s']:15.1f}")
+            if r["first_error"]:
+                print(f"        first error: {r['first_error']}")
+
+    print("\nseconds per document by stage")
+    print(f"{'clients':>7} " + " ".join(STAGES))
+    for r in rows:
+        print(f"{r['concurrency']:7d} " + " ".join(f"{r[f'{name}_s_per_doc']:{len(name)}.3f}" for name in STAGES))
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# benchmarks/synthetic.py
+"""
+Synthetic PDFs with a text layer, for offline benchmarks.
+"""
+import calendar
+import random
+
+import fitz
+
+from ocr_service.classifier import DocumentType
+
+# First-page text per document type. Later pages get continuation text only.
+FIRST_PAGE_TEXT: dict[DocumentType, list[str]] = {
+    DocumentType.NATIONAL_ID: [
+        "جمهورية مصر العربية", "بطاقة تحقيق الشخصية", "National ID card",
+    ],
+    DocumentType.COMMERCIAL_REGISTRATION: [
+        "مستخرج سجل تجاري رقم 12345", "Commercial registration extract",
+        "الرقم الموحد للسجل التجاري 98765",
+    ],
+    DocumentType.TAX_CARD: [
+        "وزارة المالية - مصلحة الضرائب المصرية", "البطاقة الضريبية", "Tax card",
+    ],
+    DocumentType.FINANCIAL_SUMMARY: [
+        "البنك المركزي المصري", "Central Bank of Egypt",
+        "مركز مجمع العميل نهاية شهر 8/2022", "بنوك التعامل",
+    ],
+    DocumentType.ISCORE_COMPANY: [
+        "الشركة المصرية للاستعلام الائتماني I-Score", "Credit score report",
+        "بيانات المنشأة", "Company profile",
+    ],
+    DocumentType.ISCORE_INDIVIDUAL: [
+        "الشركة المصرية للاستعلام الائتماني I-Score", "Credit score report",
+        "تاريخ الميلاد 1985-02-11", "Personal report",
+    ],
+}
+
+
+# MuPDF's built-in fallback font for the Arabic script (UCDN script code 6).
+# Text is written unshaped, so the text layer reads back in visual order,
+# like many real Arabic PDFs do.
+_ARABIC_FONT = fitz.Font(script=6)
+
+
+def _write_page(doc: fitz.Document, lines: list[str]) -> None:
+    page = doc.new_page()
+    writer = fitz.TextWriter(page.rect)
+    for n, line in enumerate(lines):
+        writer.append((50, 72 + 16 * n), line, font=_ARABIC_FONT, fontsize=11)
+    writer.write_text(page)
+
+
+def continuation_lines(rng: random.Random, n: int = 8) -> list[str]:
+    return [f"{rng.randint(1000, 99999)}  {rng.randint(10, 9999)}" for _ in range(n)]
+
+
+def make_bundle(path: str, parts: list[tuple[DocumentType, int]], seed: int = 0,
+                filler: int = 8) -> list[DocumentType]:
+    """
+    Write a bundle of `(doc_type, n_pages)` parts to `path` and return the
+    true label of every page. Each page gets `filler` lines of numbers
+    (about 40 fill a page, like a real scan).
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    labels = []
+    for doc_type, n_pages in parts:
+        for i in range(n_pages):
+            lines = FIRST_PAGE_TEXT[doc_type] if i == 0 else []
+            _write_page(doc, lines + continuation_lines(rng, filler))
+            labels.append(doc_type)
+    doc.save(path)
+    doc.close()
+    return labels
+
+
+def random_parts(rng: random.Random, max_parts: int = 4, max_pages: int = 4, repeat_rate: float = 0.0,
+                 repeatable: tuple[DocumentType, ...] = ()) -> list[tuple[DocumentType, int]]:
+    """
+    A random bundle layout. Adjacent parts share a type only when the first
+    is `repeatable`, with probability `repeat_rate` (e.g. two tax cards).
+    """
+    parts: list[tuple[DocumentType, int]] = []
+    for _ in range(rng.randint(1, max_parts)):
+        if parts and parts[-1][0] in repeatable and rng.random() < repeat_rate:
+            parts.append((parts[-1][0], rng.randint(1, max_pages)))
+            continue
+        choices = [t for t in DocumentType if not parts or t != parts[-1][0]]
+        parts.append((rng.choice(choices), rng.randint(1, max_pages)))
+    return parts
+
+
+def first_pages(parts: list[tuple[DocumentType, int]]) -> list[bool]:
+    """
+    Per page of a bundle made from `parts`: whether it starts a document.
+    """
+    return [i == 0 for _, n_pages in parts for i in range(n_pages)]
+
+
+def make_financial_summary(path: str, rng: random.Random, total_row: bool = False,
+                           footer: bool = False) -> dict:
+    """
+    Write a one-page CBE financial summary with a text layer and return the
+    values the local parser is expected to find. `total_row` puts a number on
+    the 'الاجمالي' line under the table, `footer` adds a page footer.
+    """
+    month, year = rng.randint(1, 12), rng.randint(2018, 2024)
+    printed = (rng.randint(1, 28), rng.randint(1, 12), year + 1)
+    governorate, gov_code = rng.choice([("القاهرة", 1), ("الجيزة", 55)])
+    banks = [rng.randint(1, 99) for _ in range(rng.randint(1, 8))]
+    expected = {
+        "Client Name": f"شركة الاختبار رقم {rng.randint(1, 999)}",
+        "CBE Code": str(rng.randint(100000, 999999)),
+        "CBE Tenor": f"{year:04d}-{month:02d}-{calendar.monthrange(year, month)[1]:02d}",
+        "Print Date": f"{printed[2]:04d}-{printed[1]:02d}-{printed[0]:02d}",
+        "Governorate Name": governorate,
+        "Governorate Code": gov_code,
+        "Finance List": banks,
+    }
+    lines = [
+        "البنك المركزي المصري",
+        f"مركز مجمع العميل نهاية شهر {month}/{year}",
+        f"تاريخ الطباعة: {printed[0]}/{printed[1]}/{printed[2]}",
+        f"اسم العميل: {expected['Client Name']}",
+        f"كود العميل: {expected['CBE Code']}",
+        f"المحافظة: {governorate}",
+        "بنوك التعامل",
+        *[str(b) for b in banks],
+        f"الاجمالي {sum(banks)}" if total_row else "الاجمالي",
+    ]
+    if footer:
+        lines += ["", f"صفحة 1 من {rng.randint(1, 3)}"]
+    doc = fitz.open()
+    _write_page(doc, lines)
+    doc.save(path)
+    doc.close()
+    return expected
+
+
+def make_iscore_report(path: str, facilities: int, seed: int = 0,
+                       doc_type: DocumentType = DocumentType.ISCORE_COMPANY,
+                       per_page: int = 6) -> None:
+    """
+    Write an iScore report: profile and credit summary on page 1, then
+    `facilities` facility tables ('التسهيل الائتماني N'), `per_page` a page.
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    _write_page(doc, FIRST_PAGE_TEXT[doc_type] + [
+        f"رقم التقرير: {rng.randint(100000, 999999)}",
+        f"التقييم الائتماني: {rng.randint(400, 800)}",
+        "ملخص محتوى التقرير للتسهيلات الائتمانية",
+        "العملة: EGP",
+        f"عدد التسهيلات: {facilities}",
+        f"اجمالي الحدود الائتمانية: {rng.randint(10**5, 10**8)}",
+    ])
+    for first in range(1, facilities + 1, per_page):
+        lines = []
+        for i in range(first, min(first + per_page, facilities + 1)):
+            lines += [
+                f"التسهيل الائتماني {i}",
+                f"كود التسهيل: {rng.randint(1000, 9999)}",
+                f"نوع التسهيل الائتماني: {rng.choice(['قرض', 'حساب جاري مدين', 'خطاب ضمان'])}",
+                f"حد الائتمان: {rng.randint(10**4, 10**7)}",
+                f"كود البنك: B{rng.randint(10, 99)}",
+                "",
+            ]
+        _write_page(doc, lines)
+    doc.save(path)
+    doc.close()
+
+
+def make_filled_form(path: str, doc_type: DocumentType, name: str, seed: int = 0, filler: int = 30) -> None:
+    """
+    Write a one-page form of `doc_type` filled in for `name`. Forms with the
+    same `seed` differ only in the name line: the same template with other
+    content.
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    _write_page(doc, FIRST_PAGE_TEXT[doc_type] + [f"الاسم التجاري: {name}"] + continuation_lines(rng, filler))
+    doc.save(path)
+    doc.close()
+
+
+def make_scan(src_path: str, path: str, dpi: int = 100, seed: int = 0, noise: int = 8,
+              offset: float = 0.0) -> None:
+    """
+    Write an image-only copy of `src_path` (no text layer), with a little
+    sensor noise, as a scanner would produce it. `offset` shifts the image
+    down and right by that many points (a sheet placed differently).
+    """
+    rng = random.Random(seed)
+    src, dst = fitz.open(src_path), fitz.open()
+    for page in src:
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+        samples = bytes(max(0, min(255, v + rng.randint(-noise, noise))) for v in pix.samples)
+        scan = fitz.Pixmap(fitz.csGRAY, pix.width, pix.height, samples, False)
+        dst.new_page(width=page.rect.width, height=page.rect.height).insert_image(
+            page.rect + (offset, offset, offset, offset), pixmap=scan)
+    dst.save(path)
+    dst.close()
+    src.close()
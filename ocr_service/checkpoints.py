@@ -0,0 +1,186 @@
+# ocr_service/checkpoints.py
+import hashlib
+import json
+import sqlite3
+import time
+from contextlib import closing
+from typing import Any, Callable
+
+from .config import CHECKPOINTS_ENABLED, CHECKPOINT_DB, CHECKPOINT_TTL_S
+from .deadline import current as current_deadline
+
+_MISSING = object()
+
+
+def hash_file(path: str) -> str:
+    """
+    SHA-256 of a file's bytes, used as the document key for checkpoints.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CheckpointStore:
+    """
+    SQLite-backed store of stage outputs keyed by (document hash, stage).
+    Values must be JSON-serialisable (strings, lists, dicts). Outputs older
+    than `ttl_s` are ignored and purged, so an answer from an old prompt or
+    a misclassification doesn't stick to a document for good.
+    """
+
+    def __init__(self, db_path: str = CHECKPOINT_DB, ttl_s: float = CHECKPOINT_TTL_S):
+        self.db_path = db_path
+        self.ttl_s = ttl_s
+        self._purged_at = 0.0
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                " doc_hash   TEXT NOT NULL,"
+                " stage      TEXT NOT NULL,"
+                " value      TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " PRIMARY KEY (doc_hash, stage))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get(self, doc_hash: str, stage: str, default: Any = None) -> Any:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT value FROM checkpoints WHERE doc_hash = ? AND stage = ? AND created_at >= ?",
+                (doc_hash, stage, time.time() - self.ttl_s),
+            ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def put(self, doc_hash: str, stage: str, value: Any) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (doc_hash, stage, value, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (doc_hash, stage, payload, time.time()),
+            )
+        if time.time() - self._purged_at > min(self.ttl_s, 3600):
+            self.purge()
+
+    def purge(self) -> int:
+        """
+        Delete checkpoints older than `ttl_s`. Returns rows removed.
+        """
+        self._purged_at = time.time()
+        with closing(self._connect()) as conn, conn:
+            return conn.execute("DELETE FROM checkpoints WHERE created_at < ?",
+                                (time.time() - self.ttl_s,)).rowcount
+
+    def list(self, doc_hash: str | None = None) -> list[dict]:
+        """
+        Describe stored checkpoints, optionally for a single document.
+        """
+        query = "SELECT doc_hash, stage, created_at, length(value) FROM checkpoints"
+        params: tuple = ()
+        if doc_hash:
+            query += " WHERE doc_hash = ?"
+            params = (doc_hash,)
+        query += " ORDER BY doc_hash, created_at"
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [
+            {"doc_hash": h, "stage": s, "created_at": t, "size": n}
+            for h, s, t, n in rows
+        ]
+
+    def invalidate(self, doc_hash: str, stage: str | None = None) -> int:
+        """
+        Drop one stage (or every stage) of a document, including the parts
+        of it checkpointed under "<hash>:<suffix>" (bundle segments).
+        Returns rows removed.
+        """
+        query = "DELETE FROM checkpoints WHERE (doc_hash = ? OR substr(doc_hash, 1, ?) = ?)"
+        params: tuple = (doc_hash, len(doc_hash) + 1, doc_hash + ":")
+        if stage is not None:
+            query += " AND stage = ?"
+            params += (stage,)
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(query, params).rowcount
+
+
+class DocumentCheckpoint:
+    """
+    Checkpoints of a single document. `run` returns the stored output of a
+    stage if one exists, otherwise computes it and stores it. Outputs
+    computed after the request's deadline forced a stage to degrade are not
+    stored, so a retry with more time redoes them in full.
+    """
+
+    def __init__(self, doc_hash: str, store: CheckpointStore):
+        self.doc_hash = doc_hash
+        self.store = store
+
+    def run(self, stage: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        value = self.store.get(self.doc_hash, stage, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = fn(*args, **kwargs)
+        if not current_deadline().partial:
+            self.store.put(self.doc_hash, stage, value)
+        return value
+
+    def child(self, suffix: str) -> "DocumentCheckpoint":
+        """
+        Checkpoints for a part of this document (e.g. one segment of a bundle).
+        """
+        return DocumentCheckpoint(f"{self.doc_hash}:{suffix}", self.store)
+
+    def stages(self) -> list[dict]:
+        return self.store.list(self.doc_hash)
+
+    def invalidate(self, stage: str | None = None) -> int:
+        return self.store.invalidate(self.doc_hash, stage)
+
+    def clear(self) -> int:
+        """
+        Drop every checkpoint of this document (and its parts), e.g. once it
+        completed: retries only need the stages of a failed run.
+        """
+        return self.invalidate()
+
+
+_default_store: CheckpointStore | None = None
+
+
+def get_store() -> CheckpointStore:
+    global _default_store
+    if _default_store is None:
+        _default_store = CheckpointStore()
+    return _default_store
+
+
+def for_document(pdf_path: str) -> DocumentCheckpoint | None:
+    """
+    Checkpoints for the document at `pdf_path`, or None when disabled.
+    """
+    if not CHECKPOINTS_ENABLED:
+        return None
+    return DocumentCheckpoint(hash_file(pdf_path), get_store())
+
+
+def run_stage(checkpoint: DocumentCheckpoint | None, stage: str,
+              fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run `fn` through `checkpoint` if there is one, otherwise just call it.
+    """
+    if checkpoint is None:
+        return fn(*args, **kwargs)
+    return checkpoint.run(stage, fn, *args, **kwargs)
+
+
+def list_checkpoints(doc_hash: str | None = None) -> list[dict]:
+    return get_store().list(doc_hash)
+
+
+def invalidate_checkpoints(doc_hash: str, stage: str | None = None) -> int:
+    return get_store().invalidate(doc_hash, stage)
@@ -1,13 +1,10 @@
 # Placeholder for ocr_service/classifier.py
+import json
 from enum import Enum, auto
-import time
-from google import genai
-from .config import API_KEY, GEMINI_MODEL
+from . import llm
+from .config import PDF_IMAGE_DPI, IMAGES_FOLDER
 from .utils.pdf_utils import pdf_to_images
 
-# Initialize the Gemini client
-tacy_client = genai.Client(api_key=API_KEY)
-
 class DocumentType(Enum):
     NATIONAL_ID = auto()
     COMMERCIAL_REGISTRATION = auto()
@@ -16,38 +13,93 @@ class DocumentType(Enum):
     ISCORE_COMPANY = auto()
     ISCORE_INDIVIDUAL = auto()
 
+# Answer of classify_image(allow_continuation=True) for a page without a heading
+CONTINUATION = "CONTINUATION"
+
 
-def classify_pdf(pdf_path: str) -> DocumentType:
+def classify_pdf(pdf_path: str, output_folder: str = IMAGES_FOLDER) -> DocumentType:
     """
     Classify a PDF by sending its first page image to Gemini.
     Returns one of the DocumentType enum values.
     """
-    # 1. Convert only the first page to an image
-    images = pdf_to_images(pdf_path, output_folder=".", dpi=150, max_pages=1)
+    # 1. Convert only the first page to an image, exactly as OCR renders it,
+    #    so the upload is shared with OCR of page 1 (see llm.files)
+    images = pdf_to_images(pdf_path, output_folder=output_folder, dpi=PDF_IMAGE_DPI, max_pages=1)
+    if not images:
+        raise FileNotFoundError(f"No pages converted from {pdf_path}")
+
+    # 2. Classify that page
+    return classify_image(images[0])
+
+
+def classify_pdf_with_text(pdf_path: str, output_folder: str = IMAGES_FOLDER) -> tuple[DocumentType, str]:
+    """
+    Classify a PDF and transcribe its first page in a single Gemini call.
+    Returns the document type and the page-1 text, which the pipeline reuses
+    instead of OCRing page 1 again.
+    """
+    images = pdf_to_images(pdf_path, output_folder=output_folder, dpi=PDF_IMAGE_DPI, max_pages=1)
     if not images:
         raise FileNotFoundError(f"No pages converted from {pdf_path}")
-    image_path = images[0]
+    return classify_and_ocr_image(images[0])
 
-    # 2. Upload to Gemini and wait until ACTIVE
-    gem_file = tacy_client.files.upload(file=image_path)
-    while not getattr(gem_file, "state", None) or gem_file.state.name != "ACTIVE":
-        time.sleep(0.5)
-        gem_file = tacy_client.files.get(name=gem_file.name)
 
-    # 3. Prompt Gemini for classification
+def classify_image(image_path: str, allow_continuation: bool = False) -> DocumentType | None:
+    """
+    Classify a single rendered page image with Gemini. With
+    `allow_continuation`, a page that continues a document (no title or
+    heading of its own) may be answered CONTINUATION, returned as None.
+    """
+    # 1. Upload to Gemini and wait until ACTIVE
+    gem_file = llm.upload_file(image_path)
+
+    # 2. Prompt Gemini for classification
+    labels = [t.name for t in DocumentType]
     prompt = (
         "Classify the type of this document. "
         "Choose exactly one of: NATIONAL_ID, COMMERCIAL_REGISTRATION, TAX_CARD, FINANCIAL_SUMMARY, ISCORE_COMPANY, ISCORE_INDIVIDUAL. "
         "Return only the label (no extra text)."
     )
-    response = tacy_client.models.generate_content(
-        model=GEMINI_MODEL,
-        contents=[gem_file, prompt]
+    if allow_continuation:
+        labels.append(CONTINUATION)
+        prompt += (
+            f" If this page has no title or heading that identifies the document type "
+            f"(a later page of a document), return {CONTINUATION}."
+        )
+    response = llm.generate(
+        "classify",
+        [gem_file, prompt],
+        validate=llm.expect_label(labels),
     )
-    label = response.text.strip().upper()
+    label = response.strip().upper()
+    if allow_continuation and label == CONTINUATION:
+        return None
 
-    # 4. Map the label to our enum
+    # 3. Map the label to our enum
     try:
         return DocumentType[label]
     except KeyError:
-        raise ValueError(f"Unrecognized document type from Gemini: '{label}'")
\ No newline at end of file
+        raise ValueError(f"Unrecognized document type from Gemini: '{label}'")
+
+def classify_and_ocr_image(image_path: str) -> tuple[DocumentType, str]:
+    """
+    Label a page image and transcribe it, as one structured response.
+    """
+    gem_file = llm.upload_file(image_path)
+    labels = [t.name for t in DocumentType]
+    prompt = (
+        "Classify the type of this document and transcribe this page.\n"
+        "Return a JSON object with exactly these keys:\n"
+        f'  "document_type": exactly one of {", ".join(labels)}\n'
+        '  "text": all visible text on this page, no commentary\n'
+        "Return only the JSON object."
+    )
+
+    def validate(text: str) -> None:
+        llm.expect_json(["document_type", "text"])(text)
+        data = json.loads(llm.strip_fences(text))
+        llm.expect_label(labels)(str(data["document_type"]))
+        llm.expect_text(str(data["text"]))
+
+    data = json.loads(llm.strip_fences(llm.generate("classify_ocr", [gem_file, prompt], validate=validate)))
+    return DocumentType[str(data["document_type"]).strip().upper()], data["text"]
@@ -0,0 +1,123 @@
+# ocr_service/deadline.py
+"""
+End-to-end time budgets.
+
+A Deadline is set at the entry point (process_document / process_bundle) and
+is visible to every stage below it through a context variable, so classify,
+render, OCR, model calls and extractor steps can all ask how much time is
+left without threading a parameter through every signature:
+
+    with deadline.use(Deadline(60)):
+        ...
+        if deadline.current().should_skip("iscore_refine", reserve_s=20):
+            return data           # degrade instead of overrunning
+
+Stages that degrade record themselves on the deadline; the pipeline reports
+them under `_meta` with `partial: true`. Work that cannot degrade raises
+DeadlineExceeded.
+"""
+import contextvars
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Raised when a stage can't start or finish within the remaining budget.
+    """
+
+
+class Deadline:
+    """
+    An absolute point in (monotonic) time; `budget_s=None` never expires.
+    """
+
+    def __init__(self, budget_s: float | None = None, expires_at: float | None = None):
+        if expires_at is None and budget_s is not None:
+            expires_at = time.monotonic() + budget_s
+        self.expires_at = expires_at
+        self.degraded: list[str] = []
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        if self.expires_at is None:
+            return math.inf
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, stage: str) -> None:
+        """
+        Raise DeadlineExceeded if no time is left to run `stage`.
+        """
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline exceeded before '{stage}'")
+
+    def within(self, budget_s: float | None, start: float | None = None) -> "Deadline":
+        """
+        A deadline no later than this one and `budget_s` after `start`
+        (a time.monotonic() value, default now).
+        """
+        if budget_s is None:
+            return Deadline(expires_at=self.expires_at)
+        expires_at = (time.monotonic() if start is None else start) + budget_s
+        if self.expires_at is not None:
+            expires_at = min(expires_at, self.expires_at)
+        return Deadline(expires_at=expires_at)
+
+    def should_skip(self, stage: str, reserve_s: float) -> bool:
+        """
+        True (and `stage` recorded as degraded) if less than `reserve_s`
+        seconds are left, i.e. the optional stage should be skipped.
+        """
+        if self.remaining() >= reserve_s:
+            return False
+        self.mark_degraded(stage)
+        return True
+
+    def mark_degraded(self, stage: str) -> None:
+        with self._lock:
+            if stage not in self.degraded:
+                self.degraded.append(stage)
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.degraded)
+
+
+_UNLIMITED = Deadline()
+_current: contextvars.ContextVar[Deadline | None] = contextvars.ContextVar("deadline", default=None)
+
+
+def current() -> Deadline:
+    """
+    The deadline of the running request (unlimited outside of one).
+    """
+    return _current.get() or _UNLIMITED
+
+
+@contextmanager
+def use(deadline: Deadline):
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def propagate(fn: Callable) -> Callable:
+    """
+    Wrap `fn` so it runs under the caller's deadline when executed on a
+    worker thread (thread pools don't inherit context variables).
+    """
+    ctx = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return ctx.copy().run(fn, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,308 @@
+# ocr_service/dedup.py
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from contextlib import closing
+from dataclasses import dataclass, field
+from typing import Any
+
+import fitz
+
+from .config import (DEDUP_DB, DEDUP_PAGES, DEDUP_MAX_DISTANCE, DEDUP_DEFAULT_MAX_DISTANCE,
+                     DEDUP_MIN_WORD_SIMILARITY, DEDUP_WINDOW_S)
+from .utils.image_utils import DARK
+from .utils.text_utils import normalize_arabic, to_english_digits
+
+HASH_SIZE = 12     # 12x12 gradient bits -> 144-bit hash per page
+_BLOCK = 8         # rendered pixels averaged into one cell of the hash grid
+_DEAD_ZONE = 10    # mean gray levels a cell must be brighter than its neighbour
+_BOX_DPI = 72
+
+
+def _ink_span(counts: list[int], trim: float = 0.005) -> tuple[int, int]:
+    """
+    First and last index holding ink, ignoring `trim` of the ink at each end
+    (scanner specks in the margins).
+    """
+    total = sum(counts)
+    if not total:
+        return 0, len(counts)
+    lo, acc = 0, 0
+    for lo, c in enumerate(counts):
+        acc += c
+        if acc > total * trim:
+            break
+    hi, acc = len(counts), 0
+    for i in range(len(counts) - 1, -1, -1):
+        acc += counts[i]
+        if acc > total * trim:
+            hi = i + 1
+            break
+    return lo, hi
+
+
+def _ink_rows(pix: fitz.Pixmap) -> list[int]:
+    return [pix.samples[y * pix.stride: y * pix.stride + pix.width].translate(DARK).count(1)
+            for y in range(pix.height)]
+
+
+def content_box(page: fitz.Page) -> fitz.Rect:
+    """
+    Bounding box of the ink on a page, so rescans with other margins or a
+    small shift are hashed over the same content.
+    """
+    scale = _BOX_DPI / 72
+    rows = _ink_rows(page.get_pixmap(dpi=_BOX_DPI, colorspace=fitz.csGRAY))
+    # Rotated a quarter turn, the rows of the render are the page's columns
+    cols = _ink_rows(page.get_pixmap(matrix=fitz.Matrix(scale, scale).prerotate(90), colorspace=fitz.csGRAY))
+    y0, y1 = _ink_span(rows)
+    x0, x1 = _ink_span(cols)
+    box = fitz.Rect(x0 / scale, y0 / scale, x1 / scale, y1 / scale) & page.rect
+    return box if not box.is_empty else page.rect
+
+
+def page_dhash(page: fitz.Page) -> int:
+    """
+    Difference hash of a page: its content box is rendered in grayscale and
+    averaged into a (HASH_SIZE + 1) x HASH_SIZE grid, and each bit says
+    whether a cell is clearly (by _DEAD_ZONE) brighter than its right
+    neighbour. Rescans of the same page (different bytes, noise, shifts)
+    land a few bits apart; other documents, even on the same form, differ
+    wherever their filled-in text differs.
+    """
+    cols, rows = HASH_SIZE + 1, HASH_SIZE
+    box = content_box(page)
+    matrix = fitz.Matrix(cols * _BLOCK / box.width, rows * _BLOCK / box.height)
+    pix = page.get_pixmap(matrix=matrix, clip=box, colorspace=fitz.csGRAY, alpha=False)
+    samples, stride = pix.samples, pix.stride
+    width, height = min(pix.width, cols * _BLOCK), min(pix.height, rows * _BLOCK)
+
+    grid = [[0] * cols for _ in range(rows)]
+    for y in range(height):
+        cells = grid[min(y // _BLOCK, rows - 1)]
+        for x, value in enumerate(samples[y * stride: y * stride + width]):
+            cells[min(x // _BLOCK, cols - 1)] += value
+
+    margin = _DEAD_ZONE * _BLOCK * _BLOCK
+    bits = 0
+    for cells in grid:
+        for left, right in zip(cells, cells[1:]):
+            bits = (bits << 1) | (left > right + margin)
+    return bits
+
+
+def _word_key(word: str) -> str:
+    return hashlib.sha256(word.encode("utf-8")).hexdigest()[:12]
+
+
+def text_signature(text: str) -> list[list[str]]:
+    """
+    The distinct words of a page's text, each as the short SHA-256 prefixes
+    (the index needs to compare words, not to read them) of the word and of
+    the word with one letter dropped: a word misread by one letter still
+    shares a key with the original.
+    """
+    words = set(re.findall(r"\w+", normalize_arabic(to_english_digits(text))))
+    signature = []
+    for word in words:
+        variants = {word[:i] + word[i + 1:] for i in range(len(word))} if len(word) > 1 else set()
+        signature.append(sorted(_word_key(w) for w in variants | {word}))
+    return sorted(signature)
+
+
+def word_similarity(a: list[list[str]], b: list[list[str]]) -> float:
+    """
+    Share of the words of two signatures found in the other one, exactly or
+    one letter off. Two transcripts of one page differ by misread letters,
+    which this tolerates; another document on the same form differs by the
+    words of its filled-in fields.
+    """
+    if not a and not b:
+        return 0.0
+    keys_a, keys_b = set().union(*a), set().union(*b)
+    found = sum(not keys_b.isdisjoint(w) for w in a) + sum(not keys_a.isdisjoint(w) for w in b)
+    return found / (len(a) + len(b))
+
+
+@dataclass
+class Fingerprint:
+    """
+    What a document is matched on: its page count, the dHashes of its
+    leading pages, a digest of their text layer ("" for scans) and the word
+    signature of page 1 (from the text layer, or set from its transcript
+    for scans; empty means the document can't be verified).
+    """
+    page_count: int
+    page_hashes: list[int]
+    text_digest: str
+    page_words: list[list[str]] = field(default_factory=list)
+
+
+def fingerprint(pdf_path: str, max_pages: int = DEDUP_PAGES) -> Fingerprint:
+    doc = fitz.open(pdf_path)
+    try:
+        pages = [doc.load_page(i) for i in range(min(max_pages, doc.page_count))]
+        texts = [page.get_text() for page in pages]
+        text = normalize_arabic(" ".join(texts))
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest() if text else ""
+        words = text_signature(texts[0]) if texts and texts[0].strip() else []
+        return Fingerprint(doc.page_count, [page_dhash(page) for page in pages], digest, words)
+    finally:
+        doc.close()
+
+
+def max_distance_for(doc_type: str) -> int:
+    return DEDUP_MAX_DISTANCE.get(doc_type, DEDUP_DEFAULT_MAX_DISTANCE)
+
+
+def distance(a: list[int], b: list[int]) -> int | None:
+    """
+    Worst per-page Hamming distance, or None if the page counts differ.
+    """
+    if len(a) != len(b):
+        return None
+    return max((bin(x ^ y).count("1") for x, y in zip(a, b)), default=0)
+
+
+class DocumentIndex:
+    """
+    SQLite store of processed documents: page hashes, type and extraction
+    result. Looked up before processing so rescans reuse the stored result.
+    Rows hold personal data, so those older than `window_s` are deleted.
+    """
+
+    def __init__(self, db_path: str = DEDUP_DB, window_s: float = DEDUP_WINDOW_S):
+        self.db_path = db_path
+        self.window_s = window_s
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " id          INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " source      TEXT NOT NULL,"
+                " page_count  INTEGER NOT NULL,"
+                " page_hashes TEXT NOT NULL,"
+                " text_digest TEXT NOT NULL,"
+                " doc_type    TEXT NOT NULL,"
+                " result      TEXT NOT NULL,"
+                " created_at  REAL NOT NULL,"
+                " page_words  TEXT NOT NULL DEFAULT '[]')"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+            if "page_words" not in columns:     # stores from before the word check
+                conn.execute("ALTER TABLE documents ADD COLUMN page_words TEXT NOT NULL DEFAULT '[]'")
+            conn.execute("CREATE INDEX IF NOT EXISTS documents_lookup ON documents (page_count, created_at)")
+        self.purge()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def add(self, source: str, fp: Fingerprint, doc_type: str, result: Any) -> int:
+        with closing(self._connect()) as conn, conn:
+            cur = conn.execute(
+                "INSERT INTO documents (source, page_count, page_hashes, text_digest, doc_type, result, "
+                "created_at, page_words) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (source, fp.page_count, json.dumps([f"{h:x}" for h in fp.page_hashes]), fp.text_digest,
+                 doc_type, json.dumps(result, ensure_ascii=False), time.time(), json.dumps(fp.page_words)),
+            )
+        self.purge()
+        return cur.lastrowid
+
+    def purge(self) -> int:
+        """
+        Delete documents processed more than `window_s` ago. Returns rows removed.
+        """
+        with closing(self._connect()) as conn, conn:
+            return conn.execute("DELETE FROM documents WHERE created_at < ?",
+                                (time.time() - self.window_s,)).rowcount
+
+    def find_similar(self, fp: Fingerprint,
+                     min_word_similarity: float = DEDUP_MIN_WORD_SIMILARITY) -> dict | None:
+        """
+        The most similar (then closest, then most recent) document processed
+        within `window_s` that is verified to be the same document:
+          - every hashed page is at most max_distance_for(its type) bits away
+            (forms of one template come that close, so this only shortlists),
+          - the page-1 words have a word_similarity of at least
+            `min_word_similarity`,
+          - when both have a text layer, their texts match.
+        A fingerprint without page-1 words (a blank page) never matches.
+        """
+        if not fp.page_words:
+            return None
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT id, page_hashes, text_digest, doc_type, page_words FROM documents "
+                "WHERE page_count = ? AND created_at >= ? ORDER BY created_at DESC",
+                (fp.page_count, time.time() - self.window_s),
+            ).fetchall()
+        best = None     # (similarity, -distance, id)
+        for doc_id, stored, digest, doc_type, words in rows:
+            if fp.text_digest and digest and fp.text_digest != digest:
+                continue
+            d = distance(fp.page_hashes, [int(h, 16) for h in json.loads(stored)])
+            if d is None or d > max_distance_for(doc_type):
+                continue
+            similarity = word_similarity(fp.page_words, json.loads(words))
+            if similarity >= min_word_similarity and (best is None or (similarity, -d) > best[:2]):
+                best = (similarity, -d, doc_id)
+        if best is None:
+            return None
+        return {**self.get(best[2]), "distance": -best[1], "word_similarity": round(best[0], 3)}
+
+    def get(self, doc_id: int) -> dict | None:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT id, source, doc_type, result, created_at FROM documents WHERE id = ?",
+                (doc_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "source": row[1], "doc_type": row[2],
+                "result": json.loads(row[3]), "created_at": row[4]}
+
+    def list(self, doc_type: str | None = None, since: float | None = None,
+             limit: int = 100) -> list[dict]:
+        """
+        Describe stored documents, newest first, optionally filtered by type
+        and by processing time (epoch seconds).
+        """
+        query = "SELECT id, source, doc_type, page_count, created_at FROM documents WHERE 1 = 1"
+        params: list = []
+        if doc_type:
+            query += " AND doc_type = ?"
+            params.append(doc_type)
+        if since is not None:
+            query += " AND created_at >= ?"
+            params.append(since)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [
+            {"id": i, "source": s, "doc_type": t, "page_count": n, "created_at": c}
+            for i, s, t, n, c in rows
+        ]
+
+    def delete(self, doc_id: int) -> int:
+        with closing(self._connect()) as conn, conn:
+            return conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,)).rowcount
+
+
+_default_index: DocumentIndex | None = None
+
+
+def get_index() -> DocumentIndex:
+    global _default_index
+    if _default_index is None:
+        _default_index = DocumentIndex()
+    return _default_index
+
+
+def list_documents(doc_type: str | None = None, since: float | None = None, limit: int = 100) -> list[dict]:
+    return get_index().list(doc_type, since, limit)
+
+
+def get_document(doc_id: int) -> dict | None:
+    return get_index().get(doc_id)
@@ -1,14 +1,38 @@
 # Placeholder for ocr_service/extractors/financial_summary.py
 from typing import List, Union
+import calendar
 import json
 import re
-from google import genai
+import fitz  # PyMuPDF
 from datetime import datetime
-from ..config import API_KEY, GEMINI_MODEL
+from .. import llm
+import unicodedata
+from ..utils.text_utils import normalize_arabic, contains_phrase, to_english_digits, visual_to_logical
+from ..config import OPTIONAL_STAGE_RESERVE_S
+from ..deadline import current as current_deadline
 from .base import BaseExtractor
 
-# Shared Gemini client
-gemini_client = genai.Client(api_key=API_KEY)
+FIELDS = [
+    "Client Name", "CBE Code", "CBE Tenor", "Print Date", "Governorate Code",
+    "Governorate Name", "Industry Code", "Industry", "Finance List",
+]
+
+# CBE governorate codes we know of (the report itself doesn't print them)
+GOVERNORATE_CODES = {"القاهره": 1, "cairo": 1, "الجيزه": 55, "giza": 55}
+
+FINANCE_TABLE_HEADER = "بنوك التعامل"
+
+# Labels of header fields, matched on normalised lines
+LABELS = {
+    "Client Name": ["اسم العميل", "client name"],
+    "CBE Code": ["كود العميل", "cbe code"],
+    "Print Date": ["تاريخ الطباعه", "print date"],
+    "Governorate Name": ["المحافظه", "governorate"],
+}
+
+_DATE = re.compile(r"(\d{1,4})\s*[/-]\s*(\d{1,2})\s*[/-]\s*(\d{1,4})")
+_NUMBER = re.compile(r"\d[\d,]*")
+_BARE_NUMBER = re.compile(r"\d{1,3}(,\d{3})+|\d+")
 
 class FinancialSummaryExtractor(BaseExtractor):
     """
@@ -20,6 +44,10 @@ class FinancialSummaryExtractor(BaseExtractor):
       3. Regex fallback for Finance List if needed.
       4. Date normalization.
 
+    When the PDF has a text layer, `extract_pdf` first parses the header
+    fields and the Finance List table locally, and asks Gemini only for the
+    fields it couldn't fill.
+
     Fields:
       - Client Name
       - CBE Code
@@ -68,25 +96,239 @@ Client Name, CBE Code, CBE Tenor, Print Date, Governorate Code,Governorate Name,
 Return only the JSON object, no commentary.
 """
 
+    def build_missing_prompt(self, text: str, missing: List[str]) -> str:
+        keys = ", ".join(missing)
+        return f"""
+Extract only these fields from the Central Bank of Egypt financial summary report and return a JSON object with exactly these keys:
+{keys}
+
+- Use English digits and 'YYYY-MM-DD' for dates.
+- CBE Tenor is the end of the month in the header 'مركز مجمع العميل نهاية شهر' (e.g. نهاية شهر 8/2022 → 2022-08-31).
+- Industry Code is the code without a backslash '/'.
+- Finance List is an array of integers: every number in the table under 'بنوك التعامل'.
+- Omit any field you can't find.
+
+===BEGIN REPORT TEXT===
+{text}
+===END REPORT TEXT===
+Return only the JSON object, no commentary.
+"""
+
+    # ——— Local (text layer) parsing ———
+
+    def parse_date(self, match: re.Match) -> str:
+        a, m, b = match.groups()
+        year, day = (a, b) if len(a) == 4 else (b, a)
+        try:
+            return datetime(int(year), int(m), int(day)).strftime('%Y-%m-%d')
+        except ValueError:
+            return ""
+
+    def line_variants(self, line: str) -> List[str]:
+        """
+        A text-layer line in logical order and as un-reversed visual order.
+        """
+        logical = unicodedata.normalize("NFKC", line).replace("\xa0", " ")
+        return [logical, visual_to_logical(line)]
+
+    def find_label_value(self, lines: List[str], labels: List[str]) -> tuple[str, str]:
+        """
+        Find 'label: value' in `lines`, whichever order the text layer stores
+        the line in. Returns (whole line, value); the value comes from the
+        next line when nothing follows the label.
+        """
+        for i, line in enumerate(lines):
+            for v, variant in enumerate(self.line_variants(line)):
+                head, sep, value = variant.partition(":")
+                if not sep:
+                    continue
+                norm = normalize_arabic(head)
+                if not any(normalize_arabic(label) in norm for label in labels):
+                    continue
+                value = value.strip()
+                if not value and i + 1 < len(lines):
+                    value = self.line_variants(lines[i + 1])[v].strip()
+                return variant, value
+        return "", ""
+
+    def bare_number(self, cell: str) -> Union[int, None]:
+        """
+        The number a table cell or line consists of, or None if it holds
+        anything else (a 'الاجمالي 102' total row, a 'صفحة 1 من 2' footer).
+        """
+        text = to_english_digits(cell or "").strip()
+        if not _BARE_NUMBER.fullmatch(text):
+            return None
+        return int(text.replace(",", ""))
+
+    def take_numbers(self, cells: List[str], ends_list: bool = False) -> Union[List[int], None]:
+        """
+        The run of bare numbers at the start of `cells` (blanks skipped). None
+        unless something other than a number ends it, or the end of `cells`
+        does with `ends_list` (a table's last row): a list that runs off the
+        page can't be told complete.
+        """
+        nums: List[int] = []
+        for cell in cells:
+            if not (cell or "").strip():
+                continue
+            n = self.bare_number(cell)
+            if n is None:
+                return nums or None
+            nums.append(n)
+        return nums if ends_list and nums else None
+
+    def find_finance_list(self, doc: fitz.Document) -> List[int]:
+        """
+        Bank numbers of the 'بنوك التعامل' table: the column under the header
+        through PyMuPDF's table finder where available, otherwise the lines
+        after the header. Returns [] (left to Gemini) unless the list is
+        cleanly delimited.
+        """
+        for page in doc:
+            if hasattr(page, "find_tables"):
+                for table in page.find_tables().tables:
+                    rows = table.extract()
+                    for r, row in enumerate(rows):
+                        columns = [c for c, cell in enumerate(row)
+                                   if cell and contains_phrase(normalize_arabic(cell), FINANCE_TABLE_HEADER)]
+                        if columns:
+                            column = [body[columns[0]] if columns[0] < len(body) else ""
+                                      for body in rows[r + 1:]]
+                            return self.take_numbers(column, ends_list=True) or []
+
+            lines = page.get_text().splitlines()
+            for i, line in enumerate(lines):
+                if contains_phrase(normalize_arabic(line), FINANCE_TABLE_HEADER):
+                    return self.take_numbers(lines[i + 1:]) or []
+        return []
+
+    def parse_local(self, pdf_path: str) -> dict:
+        """
+        Fill what we can from the PDF text layer, without calling Gemini.
+        """
+        doc = fitz.open(pdf_path)
+        lines = [line for page in doc for line in page.get_text().splitlines() if line.strip()]
+        data: dict = {}
+
+        for key in ("Client Name", "Governorate Name"):
+            _, value = self.find_label_value(lines, LABELS[key])
+            if value:
+                data[key] = value
+
+        # Numbers may sit anywhere on the line once bidi reordering is undone
+        line, _ = self.find_label_value(lines, LABELS["CBE Code"])
+        codes = re.findall(r"\d+", to_english_digits(line))
+        if codes:
+            data["CBE Code"] = max(codes, key=len)
+        line, _ = self.find_label_value(lines, LABELS["Print Date"])
+        date = _DATE.search(to_english_digits(line))
+        if date:
+            data["Print Date"] = self.parse_date(date)
+
+        full = normalize_arabic("\n".join(v for line in lines for v in self.line_variants(line)))
+        tenor = re.search(r"نهايه شهر[^\n\d]*(\d{1,2})\s*/\s*(\d{4})", full) \
+            or re.search(r"(\d{1,2})\s*/\s*(\d{4})[^\n\d]*نهايه شهر", full)
+        if tenor:
+            month, year = int(tenor.group(1)), int(tenor.group(2))
+            if 1 <= month <= 12:
+                last = calendar.monthrange(year, month)[1]
+                data["CBE Tenor"] = f"{year:04d}-{month:02d}-{last:02d}"
+
+        finance = self.find_finance_list(doc)
+        if finance:
+            data["Finance List"] = finance
+        doc.close()
+
+        self.apply_governorate_code(data)
+        return {k: v for k, v in data.items() if v not in ("", None, [])}
+
+    def apply_governorate_code(self, data: dict) -> None:
+        """
+        Cairo → 1 and Giza → 55, whatever the report or Gemini said.
+        """
+        name = normalize_arabic(str(data.get("Governorate Name", "")))
+        for known, code in GOVERNORATE_CODES.items():
+            if known in name:
+                data["Governorate Code"] = code
+                return
+
+    def extract_pdf(self, pdf_path: str) -> Union[dict, None]:
+        """
+        Text-layer fast path: parse locally, then ask Gemini (one call) only
+        for the missing fields. Returns None for scanned PDFs so the caller
+        falls back to OCR + `extract`.
+        """
+        doc = fitz.open(pdf_path)
+        text = "\n\n".join(page.get_text() for page in doc)
+        doc.close()
+        if not text.strip():
+            return None
+
+        data = self.parse_local(pdf_path)
+        local_fields = list(data)
+        missing = [k for k in FIELDS if k not in data]
+        # Out of time: return the locally parsed fields (flagged partial)
+        if missing and current_deadline().should_skip("financial_missing", OPTIONAL_STAGE_RESERVE_S):
+            missing = []
+        if missing:
+            resp = llm.generate(
+                "financial_missing",
+                [self.build_missing_prompt(text, missing)],
+                validate=llm.expect_json(),
+            )
+            json_text = re.sub(r"^```\w*|```$", "", resp.strip()).strip()
+            try:
+                filled = json.loads(json_text)
+            except json.JSONDecodeError:
+                raise ValueError(f"Failed to parse Financial Summary JSON. Raw: {json_text}")
+            for key in missing:
+                if key in filled:
+                    data[key] = filled[key]
+            self.apply_governorate_code(data)
+
+        result = self.normalize(data)
+        result = {k: result[k] for k in FIELDS if k in result}
+        result["_meta"] = {
+            "local_fields": local_fields,
+            "llm_fields": [k for k in missing if k in result],
+        }
+        return result
+
+    def normalize(self, data: dict) -> dict:
+        """
+        Finance List as ints and dates as YYYY-MM-DD.
+        """
+        if 'Finance List' in data and not isinstance(data['Finance List'], list):
+            nums = _NUMBER.findall(to_english_digits(str(data['Finance List'])))
+            data['Finance List'] = [int(n.replace(",", "")) for n in nums]
+
+        for key in ('CBE Tenor', 'Print Date'):
+            val = data.get(key, '')
+            if val:
+                # try ISO first
+                try:
+                    dt = datetime.fromisoformat(val)
+                except ValueError:
+                    # try slash format
+                    try:
+                        dt = datetime.strptime(val, '%Y/%m/%d')
+                    except ValueError:
+                        continue
+                data[key] = dt.strftime('%Y-%m-%d')
+        return data
+
     def extract(self, pages_text: List[str]) -> Union[dict, List[dict]]:
         # Combine pages
         combined = "\n\n".join(pages_text)
 
         # Step 1: raw extraction
         raw_prompt = self.build_raw_prompt(combined)
-        raw_resp = gemini_client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=[raw_prompt]
-        )
-        raw_lines = raw_resp.text.strip()
+        raw_lines = llm.generate("financial_raw", [raw_prompt], validate=llm.expect_text).strip()
 
         # Step 2: JSON conversion
         json_prompt = self.build_json_prompt(raw_lines)
-        json_resp = gemini_client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=[json_prompt]
-        )
-        json_text = json_resp.text.strip()
+        json_text = llm.generate("financial_json", [json_prompt], validate=llm.expect_json()).strip()
         # Remove code fences
         json_text = re.sub(r"^```\w*|```$", "", json_text).strip()
 
@@ -101,19 +343,6 @@ Return only the JSON object, no commentary.
             nums = re.findall(r"\d+", raw_lines.partition('Finance List:')[-1])
             data['Finance List'] = [int(n) for n in nums]
 
-        # Normalize dates
-        for key in ('CBE Tenor', 'Print Date'):
-            val = data.get(key, '')
-            if val:
-                # try ISO first
-                try:
-                    dt = datetime.fromisoformat(val)
-                except ValueError:
-                    # try slash format
-                    try:
-                        dt = datetime.strptime(val, '%Y/%m/%d')
-                    except ValueError:
-                        continue
-                data[key] = dt.strftime('%Y-%m-%d')
-
-        return data
+        # Normalize dates and the governorate code
+        self.apply_governorate_code(data)
+        return self.normalize(data)
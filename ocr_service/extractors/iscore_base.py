@@ -0,0 +1,85 @@
+# ocr_service/extractors/iscore_base.py
+from typing import Dict, Union
+import json
+import re
+from abc import abstractmethod
+import fitz  # PyMuPDF
+from .. import llm
+from .base import BaseExtractor
+from ..checkpoints import DocumentCheckpoint, run_stage
+from ..config import OPTIONAL_STAGE_RESERVE_S, ISCORE_CHUNKING_ENABLED
+from ..deadline import current as current_deadline
+from .iscore_chunks import extract_chunked
+
+
+class ScoreReportExtractor(BaseExtractor):
+    """
+    Three-step Gemini workflow shared by the iScore reports (company and
+    individual); subclasses provide the prompts:
+      1. Raw extraction: Gemini returns 'Key: Value' lines (build_raw_prompt).
+      2. JSON conversion: Gemini maps those lines into structured JSON (build_json_prompt).
+      3. JSON refinement: Gemini corrects Arabic text and structure (build_refine_prompt).
+    Reports with ISCORE_CHUNK_MIN_FACILITIES or more facility tables are split
+    into the profile and batches of facility tables, extracted concurrently
+    (see iscore_chunks).
+    """
+
+    @abstractmethod
+    def build_raw_prompt(self, full_report: str) -> str:
+        pass
+
+    @abstractmethod
+    def build_json_prompt(self, raw_lines: str) -> str:
+        pass
+
+    @abstractmethod
+    def build_refine_prompt(self, extracted_json: str) -> str:
+        pass
+
+    def raw_extract(self, full_report: str) -> str:
+        return llm.generate("iscore_raw", [self.build_raw_prompt(full_report)], validate=llm.expect_text).strip()
+
+    def json_convert(self, raw: str) -> dict:
+        json_text = llm.generate(
+            "iscore_json",
+            [self.build_json_prompt(raw)],
+            validate=llm.expect_json(["report_number", "credit_summary", "facilities"]),
+        ).strip()
+        json_text = re.sub(r"^```\w*|```$", "", json_text).strip()
+        return json.loads(json_text)
+
+    def refine(self, data: dict) -> dict:
+        refined = llm.generate(
+            "iscore_refine",
+            [self.build_refine_prompt(json.dumps(data, ensure_ascii=False))],
+            validate=llm.expect_json(),
+        ).strip()
+        refined = re.sub(r"^```\w*|```$", "", refined).strip()
+        return json.loads(refined)
+
+    def extract(self, pdf_path: str, checkpoint: DocumentCheckpoint | None = None) -> Dict[str, Union[str, dict, list]]:
+        # 1. Extract full text
+        doc = fitz.open(pdf_path)
+        pages = [doc.load_page(i).get_text() for i in range(doc.page_count)]
+        doc.close()
+
+        # Long reports (many facility tables): profile and batches of facility
+        # tables are extracted concurrently, then merged
+        if ISCORE_CHUNKING_ENABLED:
+            data = extract_chunked(self, pages, checkpoint)
+            if data is not None:
+                return data
+
+        full_report = "\n\n".join(pages)
+
+        # 2. Raw extraction (checkpointed so a failed later step resumes here)
+        raw = run_stage(checkpoint, "iscore:raw", self.raw_extract, full_report)
+
+        # 3. JSON conversion
+        data = run_stage(checkpoint, "iscore:json", self.json_convert, raw)
+
+        # 4. JSON refinement
+        # (skipped when the deadline is close; the converted JSON is usable as is)
+        if current_deadline().should_skip("iscore_refine", OPTIONAL_STAGE_RESERVE_S):
+            return data
+        return self.refine(data)
@@ -0,0 +1,184 @@
+# ocr_service/extractors/iscore_chunks.py
+"""
+Chunked extraction of long iScore reports (company and individual).
+
+A report with dozens of facility tables is too long for one prompt: every
+step gets slower and the JSON answer can hit the output limit. The report
+text is split at the facility table headings ('التسهيل الائتماني N'):
+
+  - the profile chunk, everything before the first facility table (profile,
+    identity data, credit summary), goes through the extractor's usual
+    raw -> JSON -> refine steps;
+  - facility tables, ISCORE_FACILITIES_PER_CHUNK at a time, are converted
+    straight to JSON, one call per chunk, concurrently with the profile.
+
+The facilities are merged in chunk order, de-duplicated by facility_index
+and sorted by it, and their count is checked against
+credit_summary.number_of_facilities (reported under '_meta.facility_check').
+"""
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from .. import llm
+from ..checkpoints import DocumentCheckpoint, run_stage
+from ..config import (ISCORE_CHUNK_MIN_FACILITIES, ISCORE_FACILITIES_PER_CHUNK, ISCORE_CHUNK_WORKERS,
+                      OPTIONAL_STAGE_RESERVE_S)
+from ..deadline import current as current_deadline, propagate
+from ..utils.text_utils import normalize_arabic, to_english_digits
+
+FACILITY_FIELDS = ["facility_index", "facility_code", "facility_type", "credit_limit", "bank_code"]
+
+# A facility table heading, alone on its line: 'التسهيل الائتماني 3', in logical
+# or visual (reversed) order, with the number on either side.
+_FACILITY_HEADING = re.compile(
+    r"^(\d+)?\s*(?:التسهيل [ال]*ئتماني|ي?نامتئ[ال]* ليهستلا)\s*(\d+)?$"
+)
+
+
+@dataclass
+class FacilityBlock:
+    index: int
+    text: str
+
+
+def facility_heading(line: str) -> int | None:
+    """
+    The facility number if `line` is a facility table heading.
+    """
+    match = _FACILITY_HEADING.match(normalize_arabic(line))
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    return int(match.group(1) or match.group(2))
+
+
+def split_report(pages: list[str]) -> tuple[str, list[FacilityBlock]]:
+    """
+    Split the report text into the part before the first facility table and
+    one block per facility table (heading to next heading).
+    """
+    head: list[str] = []
+    blocks: list[FacilityBlock] = []
+    for page in pages:
+        for line in page.splitlines():
+            index = facility_heading(line)
+            if index is not None:
+                blocks.append(FacilityBlock(index, line))
+            elif blocks:
+                blocks[-1].text += "\n" + line
+            else:
+                head.append(line)
+    return "\n".join(head), blocks
+
+
+def build_facilities_prompt(tables: str) -> str:
+    return f"""
+Convert every facility table below ('ﻲﻧﺎﻤﺘﺋا ﻞﻴﻬﺴﺘﻟا {{index}}') into a JSON object
+{{"facilities": [...]}}, one object per table with exactly these keys:
+{json.dumps(FACILITY_FIELDS)}
+
+Ensure bank_code contains only the alphanumeric code, Arabic text is preserved,
+numerals are English digits and dates are YYYY-MM-DD. Do not skip any table.
+
+Facility Tables:
+{tables}
+===END===
+Return only the JSON object, no commentary.
+"""
+
+
+def extract_facilities(tables: str) -> list[dict]:
+    text = llm.generate(
+        "iscore_facilities",
+        [build_facilities_prompt(tables)],
+        validate=llm.expect_json(["facilities"]),
+    )
+    facilities = json.loads(llm.strip_fences(text))["facilities"]
+    return [f for f in facilities if isinstance(f, dict)] if isinstance(facilities, list) else []
+
+
+def _as_int(value: Any) -> int | None:
+    match = re.search(r"\d+", to_english_digits(str(value or "")).replace(",", ""))
+    return int(match.group()) if match else None
+
+
+def merge_facilities(chunks: list[list[dict]]) -> list[dict]:
+    """
+    Facilities of every chunk, in chunk order, one per facility_index (a
+    later duplicate only fills fields the first one left empty), sorted by
+    index; records without an index follow in their original order.
+    """
+    by_index: dict[int, dict] = {}
+    unindexed: list[dict] = []
+    for facilities in chunks:
+        for facility in facilities:
+            index = _as_int(facility.get("facility_index"))
+            if index is None:
+                if facility not in unindexed:
+                    unindexed.append(facility)
+                continue
+            kept = by_index.setdefault(index, dict(facility))
+            for key, value in facility.items():
+                if kept.get(key) in (None, ""):
+                    kept[key] = value
+    return [by_index[i] for i in sorted(by_index)] + unindexed
+
+
+def check_facility_count(data: dict, tables: list[int]) -> dict:
+    """
+    Compare the extracted facilities with credit_summary.number_of_facilities
+    and with the facility tables found in the text.
+    """
+    extracted = {_as_int(f.get("facility_index")) for f in data.get("facilities", [])}
+    summary = data.get("credit_summary") or {}
+    expected = _as_int(summary.get("number_of_facilities")) if isinstance(summary, dict) else None
+    check = {
+        "expected": expected,
+        "tables_found": len(tables),
+        "extracted": len(data.get("facilities", [])),
+        "missing_indices": sorted(set(tables) - extracted),
+    }
+    check["consistent"] = not check["missing_indices"] and expected in (None, check["extracted"])
+    return check
+
+
+def extract_chunked(extractor, pages: list[str], checkpoint: DocumentCheckpoint | None = None) -> dict | None:
+    """
+    Extract a long report in chunks with `extractor` (raw_extract,
+    json_convert and refine handle the profile chunk). Returns None when the
+    report has fewer than ISCORE_CHUNK_MIN_FACILITIES facility tables; the
+    caller then extracts it in one piece.
+    """
+    head, blocks = split_report(pages)
+    if len(blocks) < ISCORE_CHUNK_MIN_FACILITIES:
+        return None
+    size = ISCORE_FACILITIES_PER_CHUNK
+    batches = [blocks[n:n + size] for n in range(0, len(blocks), size)]
+
+    def profile() -> dict:
+        raw = run_stage(checkpoint, "iscore:chunk:profile:raw", extractor.raw_extract, head)
+        data = run_stage(checkpoint, "iscore:chunk:profile:json", extractor.json_convert, raw)
+        data.pop("facilities", None)
+        # (skipped when the deadline is close; the converted JSON is usable as is)
+        if current_deadline().should_skip("iscore_refine", OPTIONAL_STAGE_RESERVE_S):
+            return data
+        return extractor.refine(data)
+
+    def facilities(batch: list[FacilityBlock]) -> list[dict]:
+        # Keyed by the facility tables it covers, not its position: a retry
+        # with another ISCORE_FACILITIES_PER_CHUNK must not reuse other tables.
+        tables = "\n\n".join(block.text for block in batch)
+        stage = f"iscore:chunk:facilities:{batch[0].index}-{batch[-1].index}:{len(batch)}"
+        return run_stage(checkpoint, stage, extract_facilities, tables)
+
+    with ThreadPoolExecutor(max_workers=ISCORE_CHUNK_WORKERS) as pool:
+        profile_future = pool.submit(propagate(profile))
+        facility_futures = [pool.submit(propagate(facilities), batch) for batch in batches]
+        chunks = [future.result() for future in facility_futures]
+        data = profile_future.result()
+
+    data["facilities"] = merge_facilities(chunks)
+    data.setdefault("_meta", {})["facility_check"] = check_facility_count(data, [b.index for b in blocks])
+    return data
@@ -1,18 +1,8 @@
 # Placeholder for ocr_service/extractors/iscore_company.py
 # ocr_service/extractors/iscore_company.py
-from typing import Dict, Union, List
-import json
-import re
-import fitz  # PyMuPDF
-from google import genai
-from ..config import API_KEY, GEMINI_MODEL
-from .base import BaseExtractor
-from datetime import datetime
+from .iscore_base import ScoreReportExtractor
 
-# Initialize shared Gemini client
-gemini_client = genai.Client(api_key=API_KEY)
-
-class ScoreCompanyExtractor(BaseExtractor):
+class ScoreCompanyExtractor(ScoreReportExtractor):
     """
     Extracts detailed corporate credit score report from a multi-page PDF using a three-step Gemini workflow:
       1. Raw extraction: Gemini returns 'Key: Value' lines for each section.
@@ -68,32 +58,3 @@ Please:
 - Structure 'company_profile' and 'business_risk_summary' as nested objects with correct keys.
 - Return only the corrected JSON object, no commentary.
 """
-
-    def extract(self, pdf_path: str) -> Dict[str, Union[str, dict, list]]:
-        # 1. Extract full text
-        doc = fitz.open(pdf_path)
-        pages = [doc.load_page(i).get_text() for i in range(doc.page_count)]
-        doc.close()
-        full_report = "\n\n".join(pages)
-
-        # 2. Raw extraction
-        raw = gemini_client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=[self.build_raw_prompt(full_report)]
-        ).text.strip()
-
-        # 3. JSON conversion
-        json_text = gemini_client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=[self.build_json_prompt(raw)]
-        ).text.strip()
-        json_text = re.sub(r"^```\w*|```$", "", json_text).strip()
-        data = json.loads(json_text)
-
-        # 4. JSON refinement
-        refined = gemini_client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=[self.build_refine_prompt(json.dumps(data, ensure_ascii=False))]
-        ).text.strip()
-        refined = re.sub(r"^```\w*|```$", "", refined).strip()
-        return json.loads(refined)
@@ -1,17 +1,7 @@
 # ocr_service/extractors/iscore_individual.py
-from typing import Dict, Union
-import json
-import re
-import fitz  # PyMuPDF
-from google import genai
-from ..config import API_KEY, GEMINI_MODEL
-from .base import BaseExtractor
-from datetime import datetime
+from .iscore_base import ScoreReportExtractor
 
-# Initialize shared Gemini client
-gemini_client = genai.Client(api_key=API_KEY)
-
-class ScorePersonalExtractor(BaseExtractor):
+class ScorePersonalExtractor(ScoreReportExtractor):
     """
     Extracts detailed personal credit score report from a multi-page PDF using a three-step workflow:
       1. Raw extraction: Gemini returns 'Key: Value' lines for required fields.
@@ -73,34 +63,3 @@ Please:
 - Confirm credit_summary has separate fields.
 - Return only the corrected JSON object, no commentary.
 """
-
-    def extract(self, pdf_path: str) -> Dict[str, Union[str, dict, list]]:
-        # 1. Extract text
-        doc = fitz.open(pdf_path)
-        pages = [doc.load_page(i).get_text() for i in range(doc.page_count)]
-        doc.close()
-        full_report = "\n\n".join(pages)
-
-        # 2. Raw extraction
-        raw = gemini_client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=[self.build_raw_prompt(full_report)]
-        ).text.strip()
-
-        # 3. JSON conversion
-        json_text = gemini_client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=[self.build_json_prompt(raw)]
-        ).text.strip()
-        json_text = re.sub(r"^```\w*|```$", "", json_text).strip()
-        data = json.loads(json_text)
-
-        # 4. JSON refinement
-        refined_text = gemini_client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=[self.build_refine_prompt(json.dumps(data, ensure_ascii=False))]
-        ).text.strip()
-        refined_text = re.sub(r"^```\w*|```$", "", refined_text).strip()
-        refined = json.loads(refined_text)
-
-        return refined
@@ -2,14 +2,14 @@
 from typing import List, Tuple, Union
 import json
 import re
-from google import genai
 from datetime import datetime, timedelta
-from ..config import API_KEY, GEMINI_MODEL
+from .. import llm
+from ..config import NATIONAL_ID_LOCAL_DERIVATION, OPTIONAL_STAGE_RESERVE_S
+from ..deadline import current as current_deadline
+from ..utils.national_id import decode_national_id
+from ..utils.text_utils import normalize_arabic
 from .base import BaseExtractor
 
-# Initialize a shared Gemini client
-gemini_client = genai.Client(api_key=API_KEY)
-
 class NationalIDExtractor(BaseExtractor):
     """
     Extracts fields from Egyptian national ID PDFs. Works through:
@@ -17,6 +17,12 @@ class NationalIDExtractor(BaseExtractor):
       2. Pair pages into records, handling any order and multiple IDs.
       3. Combine front/back text, then use Gemini to extract JSON directly.
       4. Post-process gender, dates, profession and fill missing expiry date.
+
+    With NATIONAL_ID_LOCAL_DERIVATION, date_of_birth and gender are decoded
+    from the 14-digit number, which is validated and cross-checked against
+    the gender printed on the back and the date of birth Gemini read. A
+    number that fails the checks is re-asked on its own instead of re-running
+    the record; if it still can't be trusted, the printed values are kept.
     """
 
     def classify_page(self, page_text: str) -> str:
@@ -29,11 +35,12 @@ You are given the OCR text from one page of an Egyptian national ID card:
 Classify this page as exactly one of: FRONT, BACK, or BOTH.
 Return only that label, with no extra text.
 """
-        response = gemini_client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=[prompt]
+        response = llm.generate(
+            "id_page_label",
+            [prompt],
+            validate=llm.expect_label(["FRONT", "BACK", "BOTH"]),
         )
-        return response.text.strip().upper()
+        return response.strip().upper()
 
     def build_record_text(self, front: str, back: str) -> str:
         """
@@ -48,29 +55,129 @@ Return only that label, with no extra text.
 ===END BACK===
 """
 
-    def build_json_prompt(self, record_text: str) -> str:
+    def build_json_prompt(self, record_text: str, derive_locally: bool = False) -> str:
         """
-        Ask Gemini to extract all fields into a clean JSON object.
+        Ask Gemini to extract all fields into a clean JSON object. With
+        `derive_locally`, gender is left out (it is read off the back and the
+        number); date_of_birth is still asked, to cross-check the number.
         """
+        if derive_locally:
+            derived_fields = "date_of_birth (YYYY-MM-DD), "
+            gender_rule = ""
+        else:
+            derived_fields = """gender ('Male' or 'Female'),
+  date_of_birth (YYYY-MM-DD), """
+            gender_rule = "- Map Arabic 'ذكر' to 'Male' and 'انثى' to 'Female'.\n"
         return f"""
 You are given combined OCR text from the FRONT and BACK of an Egyptian national ID card:
 {record_text}
 
 Extract the following fields and return a JSON object with exactly these keys:
   full_name (line 1), note the first name will be found in one line and followed by line break doesn't contain any thing else so you should concate it with the parent name.
-  gender ('Male' or 'Female'),
-  date_of_birth (YYYY-MM-DD), national_id_number (14 digits),
+  {derived_fields}national_id_number (14 digits),
   issue_date (YYYY-MM-DD), expiration_date (YYYY-MM-DD),
   address, profession.
 
-- Map Arabic 'ذكر' to 'Male' and 'انثى' to 'Female'.
-- Convert all Arabic numerals to English digits.
+{gender_rule}- Convert all Arabic numerals to English digits.
 - If 'expiration_date' is missing, you will add 7 years to 'issue_date' after parsing.
 - Ignore any machine-readable zone (MRZ) or scanner footer text.
 
 Return only the JSON object, with no code fences or extra commentary.
 """
 
+    def build_number_prompt(self, front: str, problem: str) -> str:
+        """
+        Targeted re-ask for the national ID number alone.
+        """
+        return f"""
+You are given the OCR text from the FRONT of an Egyptian national ID card:
+{front}
+
+The national ID number read previously looks wrong ({problem}).
+Find the 14-digit national ID number (الرقم القومي) printed on the card,
+convert it to English digits and return only those 14 digits.
+"""
+
+    def printed_gender(self, back: str) -> str:
+        """
+        Gender as printed on the back of the card, or '' if not found.
+        """
+        text = normalize_arabic(back)
+        male, female = "ذكر" in text, "انثي" in text
+        if male == female:
+            return ""
+        return "Male" if male else "Female"
+
+    def printed_birth_date(self, data: dict) -> str:
+        """
+        Date of birth as Gemini read it (YYYY-MM-DD), or '' if unusable.
+        """
+        value = str(data.get("date_of_birth") or "").strip()
+        try:
+            return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+        except ValueError:
+            return ""
+
+    def check_number(self, decoded: dict, printed_gender: str, printed_birth: str = "") -> str:
+        """
+        Describe why a decoded number can't be trusted, or '' if it can.
+        """
+        if decoded["errors"]:
+            return "; ".join(decoded["errors"])
+        if printed_gender and decoded["gender"] != printed_gender:
+            return f"encodes {decoded['gender']} but the card says {printed_gender}"
+        if printed_birth and decoded["date_of_birth"] != printed_birth:
+            return f"encodes birth date {decoded['date_of_birth']} but the card says {printed_birth}"
+        return ""
+
+    def validate_number(self, text: str) -> None:
+        problem = self.check_number(decode_national_id(text), "")
+        if problem:
+            raise ValueError(problem)
+
+    def derive_fields(self, data: dict, front: str, back: str) -> dict:
+        """
+        Fill date_of_birth and gender from the national ID number, re-asking
+        Gemini for the number only if it fails validation. While the number
+        can't be trusted, the printed gender and date of birth win.
+        """
+        printed_gender = self.printed_gender(back)
+        printed_birth = self.printed_birth_date(data)
+        decoded = decode_national_id(data.get("national_id_number", ""))
+        problem = self.check_number(decoded, printed_gender, printed_birth)
+        reasked = False
+        if problem and not current_deadline().should_skip("id_number", OPTIONAL_STAGE_RESERVE_S):
+            reasked = True
+            try:
+                resp = llm.generate(
+                    "id_number",
+                    [self.build_number_prompt(front, problem)],
+                    validate=self.validate_number,
+                )
+            except ValueError:
+                resp = ""
+            retry = decode_national_id(resp)
+            if resp and not self.check_number(retry, printed_gender, printed_birth):
+                decoded, problem = retry, ""
+
+        data["national_id_number"] = decoded["national_id_number"]
+        # An unresolved problem means the number can't be trusted over the card
+        data["date_of_birth"] = (printed_birth if problem else decoded["date_of_birth"]) \
+            or printed_birth or decoded["date_of_birth"]
+        data["gender"] = (printed_gender if problem else decoded["gender"]) or printed_gender or decoded["gender"]
+        data["_meta"] = {
+            "national_id": {
+                "governorate": decoded["governorate"],
+                "checksum_ok": decoded["checksum_ok"],
+                "reasked": reasked,
+                "problem": problem,
+            }
+        }
+        # Keep the historical key order of the output
+        order = ["full_name", "gender", "date_of_birth", "national_id_number",
+                 "issue_date", "expiration_date", "address", "profession"]
+        return {**{k: data.get(k, "") for k in order}, **data}
+
     def extract(self, pages_text: List[str]) -> Union[dict, List[dict]]:
         # 1. Classify pages
         classified: List[Tuple[int, str, str]] = []
@@ -105,12 +212,12 @@ Return only the JSON object, with no code fences or extra commentary.
         outputs = []
         for front_text, back_text in records:
             record_text = self.build_record_text(front_text, back_text)
-            prompt = self.build_json_prompt(record_text)
-            resp = gemini_client.models.generate_content(
-                model=GEMINI_MODEL,
-                contents=[prompt]
-            )
-            raw = resp.text.strip()
+            prompt = self.build_json_prompt(record_text, derive_locally=NATIONAL_ID_LOCAL_DERIVATION)
+            raw = llm.generate(
+                "id_extract",
+                [prompt],
+                validate=llm.expect_json(["full_name", "national_id_number"]),
+            ).strip()
             # Remove code fences if any
             raw = re.sub(r"^```\w*|```$", "", raw).strip()
 
@@ -119,7 +226,11 @@ Return only the JSON object, with no code fences or extra commentary.
             except json.JSONDecodeError:
                 raise ValueError(f"JSON parse failed. Raw response: {raw}")
 
-            # 4. Post-process expiration_date
+            # 4. Derive date_of_birth/gender from the ID number
+            if NATIONAL_ID_LOCAL_DERIVATION:
+                data = self.derive_fields(data, front_text, back_text)
+
+            # 5. Post-process expiration_date
             if not data.get('expiration_date') and data.get('issue_date'):
                 dt = datetime.strptime(data['issue_date'], '%Y-%m-%d') + timedelta(days=7*365)
                 data['expiration_date'] = dt.strftime('%Y-%m-%d')
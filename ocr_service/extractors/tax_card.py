@@ -3,14 +3,10 @@
 from typing import List, Union
 import json
 import re
-from google import genai
 from datetime import datetime
-from ..config import API_KEY, GEMINI_MODEL
+from .. import llm
 from .base import BaseExtractor
 
-# Shared Gemini client
-gemini_client = genai.Client(api_key=API_KEY)
-
 class TaxCardExtractor(BaseExtractor):
     """
     Extractor for Tax Card PDFs. Treats the entire document as one record.
@@ -63,11 +59,8 @@ Use English digits for all numbers and dates. If a field is missing, set its val
 Return only the JSON object.
 """        
         # Call Gemini
-        response = gemini_client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=[prompt]
-        )
-        raw = response.text.strip()
+        response = llm.generate("tax_card", [prompt], validate=llm.expect_json())
+        raw = response.strip()
         # Remove backticks or code fences
         raw = re.sub(r"^```\w*|```$", "", raw).strip()
         
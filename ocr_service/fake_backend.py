@@ -0,0 +1,248 @@
+# ocr_service/fake_backend.py
+"""
+Local stand-in for the google-genai client, for benchmarks and load tests.
+
+    from ocr_service import llm
+    from ocr_service.fake_backend import FakeClient, LongTailLatency
+
+    llm.set_client(FakeClient(latency=LongTailLatency(median=0.8, tail_prob=0.02)))
+
+It mimics the parts of `genai.Client` the pipeline uses:
+  - client.models.generate_content(model=..., contents=[...], config=None),
+    honouring a per-request timeout in config["http_options"]["timeout"] (ms)
+  - client.files.upload(file=path) / get(name=...) / delete(name=...) / list()
+with configurable latency (lognormal body plus rare long stalls), per-model
+speed factors and an optional requests-per-minute quota.
+"""
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Callable
+
+# Relative speed of each model tier, multiplied into the sampled latency.
+MODEL_SPEED = {
+    "gemini-2.0-flash-lite": 0.6,
+    "gemini-2.0-flash": 1.0,
+    "gemini-2.5-pro": 2.5,
+}
+
+LABELS = ["NATIONAL_ID", "COMMERCIAL_REGISTRATION", "TAX_CARD",
+          "FINANCIAL_SUMMARY", "ISCORE_COMPANY", "ISCORE_INDIVIDUAL"]
+
+
+class QuotaExceeded(Exception):
+    """
+    Raised like the API's 429 RESOURCE_EXHAUSTED when the quota is used up.
+    """
+    code = 429
+
+
+class LongTailLatency:
+    """
+    Lognormal latency around `median` seconds; with probability `tail_prob`
+    the call stalls for `tail_scale` times longer.
+    """
+
+    def __init__(self, median: float = 1.0, sigma: float = 0.35,
+                 tail_prob: float = 0.02, tail_scale: float = 20.0, seed: int | None = None):
+        self.median = median
+        self.sigma = sigma
+        self.tail_prob = tail_prob
+        self.tail_scale = tail_scale
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            latency = self.median * math.exp(self._rng.gauss(0.0, self.sigma))
+            if self._rng.random() < self.tail_prob:
+                latency *= self.tail_scale
+        return latency
+
+
+class RateQuota:
+    """
+    Sliding one-minute window of at most `rpm` requests. With `block=True`
+    callers wait for capacity instead of getting QuotaExceeded.
+    """
+
+    def __init__(self, rpm: int, block: bool = False, time_scale: float = 1.0):
+        self.rpm = rpm
+        self.block = block
+        self.window = 60.0 * time_scale
+        self._calls: deque[float] = deque()
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.waited_s = 0.0
+
+    def acquire(self) -> None:
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._calls and now - self._calls[0] > self.window:
+                    self._calls.popleft()
+                if len(self._calls) < self.rpm:
+                    self._calls.append(now)
+                    self.waited_s += now - start
+                    return
+                if not self.block:
+                    self.rejected += 1
+                    raise QuotaExceeded(f"quota of {self.rpm} requests/min exceeded")
+                wait = self.window - (now - self._calls[0])
+            time.sleep(max(wait, 0.001))
+
+
+PAGE_TEXT = "نص تجريبي\nfake page text\nKey: Value"
+
+
+def _label_for(files: list) -> str:
+    for f in files:
+        for label in LABELS:
+            if label.lower() in f.display_name.lower():
+                return label
+    return "FINANCIAL_SUMMARY"
+
+
+def default_responder(model: str, contents: list) -> str:
+    """
+    Plausible answers by prompt shape: labels for classification prompts,
+    label plus transcription for fused classification, a JSON object with
+    the requested keys for JSON prompts, text otherwise.
+    """
+    prompt = "\n".join(c for c in contents if isinstance(c, str))
+    files = [c for c in contents if isinstance(c, FakeFile)]
+
+    if '"document_type"' in prompt:
+        return json.dumps({"document_type": _label_for(files), "text": PAGE_TEXT}, ensure_ascii=False)
+    if "Choose exactly one of" in prompt or "Return only the label" in prompt:
+        return _label_for(files)
+    if "FRONT, BACK, or BOTH" in prompt:
+        return "BOTH"
+    if "14-digit national ID number" in prompt:
+        return "29001012101234"
+    if "JSON" in prompt:
+        keys = re.findall(r"\b([a-z][a-z_]+)\s\(", prompt)
+        quoted = re.search(r"\[(\"[^\]]+\")\]", prompt)
+        if quoted:
+            keys += json.loads(f"[{quoted.group(1)}]")
+        data = {k: "29001012101234" if k == "national_id_number" else "" for k in keys}
+        return json.dumps(data or {"value": ""}, ensure_ascii=False)
+    return PAGE_TEXT
+
+
+class FakeFile(SimpleNamespace):
+    pass
+
+
+class FakeFiles:
+    """
+    In-memory file service. Uploads stay PROCESSING for `activation_s`
+    seconds, then become ACTIVE; they expire after `ttl_s`.
+    """
+
+    def __init__(self, activation_s: float = 0.2, ttl_s: float = 48 * 3600, time_scale: float = 1.0):
+        self.activation_s = activation_s * time_scale
+        self.ttl_s = ttl_s
+        self._files: dict[str, FakeFile] = {}
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.uploads = 0
+        self.deletes = 0
+        self.bytes_uploaded = 0
+
+    def _state(self, f: FakeFile) -> FakeFile:
+        ready = time.monotonic() - f._created >= self.activation_s
+        f.state = SimpleNamespace(name="ACTIVE" if ready else "PROCESSING")
+        return f
+
+    def upload(self, file, config=None) -> FakeFile:
+        with open(file, "rb") as fh:
+            size = len(fh.read())
+        with self._lock:
+            self._seq += 1
+            name = f"files/fake-{self._seq}"
+            f = FakeFile(name=name, display_name=os.path.basename(str(file)), size_bytes=size,
+                         uri=f"fake://{name}", expiration_time=time.time() + self.ttl_s,
+                         _created=time.monotonic())
+            self._files[name] = f
+            self.uploads += 1
+            self.bytes_uploaded += size
+        return self._state(f)
+
+    def get(self, name: str) -> FakeFile:
+        with self._lock:
+            f = self._files.get(name)
+        if f is None or f.expiration_time < time.time():
+            raise KeyError(f"File {name} not found")
+        return self._state(f)
+
+    def delete(self, name: str) -> None:
+        with self._lock:
+            if self._files.pop(name, None) is not None:
+                self.deletes += 1
+
+    def list(self) -> list[FakeFile]:
+        with self._lock:
+            return [self._state(f) for f in self._files.values()]
+
+
+def _http_timeout_s(config) -> float | None:
+    """
+    The per-request HTTP timeout of a generate_content config, in seconds.
+    """
+    options = config.get("http_options") if isinstance(config, dict) else getattr(config, "http_options", None)
+    if options is None:
+        return None
+    timeout = options.get("timeout") if isinstance(options, dict) else getattr(options, "timeout", None)
+    return None if timeout is None else timeout / 1000
+
+
+class FakeModels:
+    def __init__(self, latency: LongTailLatency, responder: Callable[[str, list], str],
+                 quota: RateQuota | None, time_scale: float):
+        self.latency = latency
+        self.responder = responder
+        self.quota = quota
+        self.time_scale = time_scale
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, model: str, contents: list, config=None):
+        if self.quota is not None:
+            self.quota.acquire()
+        with self._lock:
+            self.calls += 1
+        start = time.monotonic()
+        timeout = _http_timeout_s(config)
+        delay = self.latency.sample() * MODEL_SPEED.get(model, 1.0) * self.time_scale
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"{model} request timed out after {timeout:.2f}s")
+        time.sleep(delay)
+        text = self.responder(model, contents)
+        if timeout is not None and time.monotonic() - start > timeout:
+            raise TimeoutError(f"{model} request timed out after {timeout:.2f}s")
+        return SimpleNamespace(text=text)
+
+
+class FakeClient:
+    """
+    Drop-in for `genai.Client` backed by FakeModels and FakeFiles.
+    `time_scale` shrinks every delay (e.g. 0.01 to run a benchmark 100x faster).
+    """
+
+    def __init__(self, latency: LongTailLatency | None = None,
+                 responder: Callable[[str, list], str] = default_responder,
+                 rpm: int | None = None, block_on_quota: bool = False,
+                 time_scale: float = 1.0, activation_s: float = 0.2):
+        quota = RateQuota(rpm, block_on_quota, time_scale) if rpm else None
+        self.models = FakeModels(latency or LongTailLatency(), responder, quota, time_scale)
+        self.files = FakeFiles(activation_s=activation_s, time_scale=time_scale)
+        self.quota = quota
@@ -0,0 +1,191 @@
+# ocr_service/file_registry.py
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable
+
+from .checkpoints import hash_file
+from .config import FILE_KEEP_S, FILE_EXPIRY_MARGIN_S, FILE_SWEEP_INTERVAL_S
+
+# Gemini keeps uploads for 48 hours unless the file says otherwise
+DEFAULT_TTL_S = 48 * 3600
+
+
+def expires_at(remote: Any, uploaded_at: float) -> float:
+    """
+    Expiry (epoch seconds) of an uploaded file; accepts the API's datetime
+    or a plain timestamp.
+    """
+    value = getattr(remote, "expiration_time", None)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return float(value)
+    return uploaded_at + DEFAULT_TTL_S
+
+
+@dataclass
+class _Entry:
+    remote: Any = None
+    size: int = 0
+    expires_at: float = 0.0
+    refs: int = 0
+    last_used: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class FileRegistry:
+    """
+    Uploaded files keyed by the SHA-256 of their bytes.
+
+    `acquire(path)` returns a still-valid remote file with the same bytes if
+    one exists (e.g. page 1 uploaded for classification, then again for
+    OCR), otherwise uploads it. Concurrent acquires of the same bytes share
+    one upload. Files acquired inside `scope()` are held until the scope
+    ends; a background sweeper deletes files that expired or have been idle
+    for FILE_KEEP_S.
+    """
+
+    def __init__(self, upload: Callable[[str], Any], delete: Callable[[Any], None],
+                 keep_s: float = FILE_KEEP_S, expiry_margin_s: float = FILE_EXPIRY_MARGIN_S,
+                 sweep_interval_s: float = FILE_SWEEP_INTERVAL_S):
+        self._upload = upload
+        self._delete = delete
+        self.keep_s = keep_s
+        self.expiry_margin_s = expiry_margin_s
+        self.sweep_interval_s = sweep_interval_s
+        self._entries: dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._scope: contextvars.ContextVar[list | None] = contextvars.ContextVar("file_scope", default=None)
+        self._sweeper: threading.Thread | None = None
+        self.uploads = 0
+        self.reuses = 0
+        self.deletes = 0
+        self.bytes_uploaded = 0
+        self.bytes_saved = 0
+
+    def acquire(self, path: str) -> Any:
+        key = hash_file(path)
+        with self._lock:
+            entry = self._entries.setdefault(key, _Entry())
+            entry.refs += 1
+        held = self._scope.get()
+        try:
+            with entry.lock:
+                if entry.remote is not None and time.time() < entry.expires_at - self.expiry_margin_s:
+                    with self._lock:
+                        self.reuses += 1
+                        self.bytes_saved += entry.size
+                else:
+                    if entry.remote is not None:
+                        self._delete_quietly(entry.remote)
+                    uploaded_at = time.time()
+                    entry.remote = self._upload(path)
+                    entry.size = getattr(entry.remote, "size_bytes", None) or _file_size(path)
+                    entry.expires_at = expires_at(entry.remote, uploaded_at)
+                    with self._lock:
+                        self.uploads += 1
+                        self.bytes_uploaded += entry.size
+                entry.last_used = time.monotonic()
+                remote = entry.remote
+        except BaseException:
+            self._release(key)
+            raise
+        if held is not None:
+            held.append(key)
+        else:
+            self._release(key)
+        self._ensure_sweeper()
+        return remote
+
+    def _release(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.refs -= 1
+            entry.last_used = time.monotonic()
+            if entry.remote is None and entry.refs == 0:
+                del self._entries[key]      # the upload failed
+
+    @contextmanager
+    def scope(self):
+        """
+        Hold every file acquired inside the block (also from worker threads
+        that copy the context) until the block ends.
+        """
+        held: list[str] = []
+        token = self._scope.set(held)
+        try:
+            yield
+        finally:
+            self._scope.reset(token)
+            for key in held:
+                self._release(key)
+
+    def sweep(self) -> int:
+        """
+        Delete uploads that expired or have been idle for `keep_s`.
+        Returns how many were deleted.
+        """
+        now, wall = time.monotonic(), time.time()
+        doomed = []
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.remote is None or entry.refs > 0 or entry.lock.locked():
+                    continue
+                if wall >= entry.expires_at - self.expiry_margin_s or now - entry.last_used >= self.keep_s:
+                    doomed.append(entry.remote)
+                    del self._entries[key]
+        for remote in doomed:
+            self._delete_quietly(remote)
+        return len(doomed)
+
+    def clear(self) -> None:
+        """
+        Forget every entry without deleting remote files (e.g. after the
+        client changed and they are no longer reachable).
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def _delete_quietly(self, remote: Any) -> None:
+        try:
+            self._delete(remote)
+            with self._lock:
+                self.deletes += 1
+        except Exception:
+            pass    # expired already, or gone; nothing to clean up
+
+    def _ensure_sweeper(self) -> None:
+        if self._sweeper is not None:
+            return
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep_forever, name="file-sweeper", daemon=True)
+                self._sweeper.start()
+
+    def _sweep_forever(self) -> None:
+        while True:
+            time.sleep(self.sweep_interval_s)
+            self.sweep()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "uploads": self.uploads,
+                "reuses": self.reuses,
+                "deletes": self.deletes,
+                "live": sum(e.remote is not None for e in self._entries.values()),
+                "bytes_uploaded": self.bytes_uploaded,
+                "bytes_saved": self.bytes_saved,
+            }
+
+
+def _file_size(path: str) -> int:
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        return f.tell()
@@ -0,0 +1,446 @@
+# ocr_service/llm.py
+"""
+Single entry point for Gemini calls.
+
+Every call names its pipeline stage; the stage picks the model tier it starts
+on (config.STAGE_TIERS). If the caller's local validation of the answer fails
+(schema, label set, consistency), the call is repeated on the next stronger
+tier, up to config.MAX_ESCALATIONS times. Escalation rates and latencies are
+collected per stage and reported by `report()`. A small share of the calls of
+stages starting on a cheaper tier (config.BASELINE_SAMPLE_RATE) run on
+DEFAULT_TIER instead, so each stage has its own latency baseline.
+
+Calls may be hedged (config.HEDGING_ENABLED): if a call is still running
+after the HEDGE_PERCENTILE of recent latencies of its stage on its model (a
+one-word label and a page transcription have different tails), a duplicate is
+issued and the first answer wins. At most HEDGE_MAX_RATE of calls are hedged,
+so a slow backend can't double the quota spend. Only generate_content calls
+are hedged; they are idempotent, uploads are not.
+
+Calls respect the deadline of the running request (ocr_service.deadline):
+each request carries the remaining budget as its HTTP timeout, in the
+calling thread, so a call that doesn't return in time is cancelled and
+raises DeadlineExceeded instead of queueing on (or stalling) a shared pool.
+Only hedged calls run on the pool, which they need to race a duplicate.
+
+Calls are admitted by `scheduler` (config.SCHEDULER_ENABLED, off by
+default): each attempt waits for a slot of the request's priority class, so
+interactive requests overtake queued batch work (ocr_service.scheduler).
+"""
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from google import genai
+
+from .config import (API_KEY, MODEL_TIERS, TIER_ORDER, STAGE_TIERS, DEFAULT_TIER, MAX_ESCALATIONS,
+                     HEDGING_ENABLED, HEDGE_PERCENTILE, HEDGE_MAX_RATE, HEDGE_MIN_SAMPLES,
+                     HEDGE_WINDOW, HEDGE_POOL_SIZE, UPLOAD_ACTIVE_TIMEOUT_S, FILE_REUSE_ENABLED,
+                     SCHEDULER_ENABLED, BASELINE_SAMPLE_RATE, BASELINE_MIN_SAMPLES)
+from .deadline import DeadlineExceeded, current as current_deadline
+from .file_registry import FileRegistry
+from .scheduler import Scheduler
+from . import metrics
+
+client = genai.Client(api_key=API_KEY)
+
+Validator = Callable[[str], Any]
+
+
+def set_client(new_client) -> None:
+    """
+    Swap the Gemini client (e.g. for a local fake backend).
+    """
+    global client
+    client = new_client
+    files.clear()
+
+
+def upload_file(path: str):
+    """
+    Upload a file to Gemini (or reuse a still-valid upload of the same
+    bytes, see `files`) and return it once it is ACTIVE.
+    """
+    with metrics.timed("upload"):
+        if FILE_REUSE_ENABLED:
+            return files.acquire(path)
+        return _upload_and_wait(path)
+
+
+def _upload_and_wait(path: str):
+    """
+    Upload a file and wait until it is ACTIVE, for at most
+    UPLOAD_ACTIVE_TIMEOUT_S or the request's remaining budget.
+    """
+    deadline = current_deadline()
+    deadline.check("upload")
+    gemini_file = client.files.upload(file=path)
+    give_up = time.monotonic() + min(UPLOAD_ACTIVE_TIMEOUT_S, deadline.remaining())
+    while not getattr(gemini_file, "state", None) or gemini_file.state.name != "ACTIVE":
+        if getattr(gemini_file, "state", None) and gemini_file.state.name == "FAILED":
+            raise ValueError(f"Upload of {path} failed")
+        if time.monotonic() >= give_up:
+            try:
+                client.files.delete(name=gemini_file.name)
+            except Exception:
+                pass
+            if deadline.expired():
+                raise DeadlineExceeded(f"Deadline exceeded waiting for upload of {path}")
+            raise TimeoutError(f"Upload of {path} not ACTIVE after {UPLOAD_ACTIVE_TIMEOUT_S}s")
+        time.sleep(0.5)
+        gemini_file = client.files.get(name=gemini_file.name)
+    return gemini_file
+
+
+def _delete_file(gemini_file) -> None:
+    client.files.delete(name=gemini_file.name)
+
+
+# Uploads keyed by content hash: reused while valid, deleted when idle/expired.
+# Wrap a unit of work in `files.scope()` to hold its uploads until it ends.
+files = FileRegistry(_upload_and_wait, _delete_file)
+
+
+# Admission of model calls by priority class; replace it (e.g. with other
+# weights) with `llm.scheduler = Scheduler(...)`.
+scheduler = Scheduler()
+
+
+# ——— Validators ———
+
+def strip_fences(text: str) -> str:
+    return re.sub(r"^```(?:json|\w*)?\s*|\s*```$", "", text.strip(), flags=re.IGNORECASE).strip()
+
+
+def expect_json(required: list[str] | None = None) -> Validator:
+    """
+    Validator: the answer parses as a JSON object holding `required` keys.
+    """
+    def validate(text: str) -> None:
+        try:
+            data = json.loads(strip_fences(text))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"invalid JSON: {e}") from e
+        if not isinstance(data, dict):
+            raise ValueError("JSON is not an object")
+        missing = [k for k in (required or []) if k not in data]
+        if missing:
+            raise ValueError(f"missing keys: {missing}")
+    return validate
+
+
+def expect_label(labels: list[str]) -> Validator:
+    """
+    Validator: the answer is exactly one of `labels`.
+    """
+    def validate(text: str) -> None:
+        if text.strip().upper() not in labels:
+            raise ValueError(f"unexpected label '{text.strip()}'")
+    return validate
+
+
+def expect_text(text: str) -> None:
+    if not text or not text.strip():
+        raise ValueError("empty response")
+
+
+# ——— Routing and statistics ———
+
+class _Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = defaultdict(int)             # stage -> calls
+        self.escalations = defaultdict(int)       # stage -> calls that escalated
+        self.sampled = defaultdict(int)           # stage -> calls run on DEFAULT_TIER as a baseline
+        self.latency = defaultdict(list)          # (stage, tier) -> seconds per attempt
+
+    def record(self, stage: str, tier: str, seconds: float) -> None:
+        with self.lock:
+            self.latency[(stage, tier)].append(seconds)
+
+
+_stats = _Stats()
+
+
+def tiers_for(stage: str, baseline: bool = False) -> list[str]:
+    """
+    Tiers a stage may use, starting tier first (DEFAULT_TIER with `baseline`).
+    """
+    start = TIER_ORDER.index(DEFAULT_TIER if baseline else STAGE_TIERS.get(stage, DEFAULT_TIER))
+    return TIER_ORDER[start:start + MAX_ESCALATIONS + 1]
+
+
+def _routed_below_default(stage: str) -> bool:
+    return TIER_ORDER.index(STAGE_TIERS.get(stage, DEFAULT_TIER)) < TIER_ORDER.index(DEFAULT_TIER)
+
+
+# ——— Hedged requests ———
+
+@dataclass
+class HedgePolicy:
+    enabled: bool = HEDGING_ENABLED
+    percentile: float = HEDGE_PERCENTILE
+    max_rate: float = HEDGE_MAX_RATE
+    min_samples: int = HEDGE_MIN_SAMPLES
+
+
+hedging = HedgePolicy()
+
+
+def set_hedging(**changes) -> None:
+    """
+    Change the hedge policy at runtime, e.g. set_hedging(enabled=True).
+    """
+    for key, value in changes.items():
+        if not hasattr(hedging, key):
+            raise AttributeError(f"Unknown hedging setting '{key}'")
+        setattr(hedging, key, value)
+
+
+class _HedgeState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.recent = defaultdict(lambda: deque(maxlen=HEDGE_WINDOW))   # (stage, model) -> seconds
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def delay(self, stage: str, model: str) -> float | None:
+        """
+        Hedge delay for `stage` on `model`, or None if there's no basis or
+        no budget.
+        """
+        with self.lock:
+            samples = sorted(self.recent[(stage, model)])
+            if len(samples) < hedging.min_samples:
+                return None
+            if self.hedged + 1 > hedging.max_rate * self.calls:
+                return None
+            return samples[min(len(samples) - 1, int(len(samples) * hedging.percentile / 100))]
+
+
+_hedge = _HedgeState()
+_hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_POOL_SIZE, thread_name_prefix="gemini-call")
+
+
+def _send(stage: str, model: str, contents: list, config: Any = None) -> str:
+    kwargs = {"model": model, "contents": contents}
+    if config is not None:
+        kwargs["config"] = config
+    start = time.perf_counter()
+    text = client.models.generate_content(**kwargs).text or ""
+    with _hedge.lock:
+        _hedge.recent[(stage, model)].append(time.perf_counter() - start)
+    return text
+
+
+def _with_timeout(config: Any, seconds: float) -> Any:
+    """
+    `config` for generate_content plus a per-request HTTP timeout.
+    """
+    timeout = {"timeout": max(1, math.ceil(seconds * 1000))}       # milliseconds
+    if config is None:
+        return {"http_options": timeout}
+    if isinstance(config, dict):
+        return {**config, "http_options": {**(config.get("http_options") or {}), **timeout}}
+    from google.genai import types
+    return config.model_copy(update={"http_options": types.HttpOptions(**timeout)})
+
+
+def _call(stage: str, model: str, contents: list, config: Any = None, hedge: bool = True,
+          lease=None) -> str:
+    deadline = current_deadline()
+    bounded = deadline.expires_at is not None
+    if bounded:
+        config = _with_timeout(config, deadline.remaining())
+    try:
+        if hedge and hedging.enabled:
+            return _hedged(stage, model, contents, config, deadline.remaining(), lease)
+        return _send(stage, model, contents, config)
+    except FutureTimeout:
+        raise DeadlineExceeded(f"Deadline exceeded waiting for {model}") from None
+    except Exception as e:
+        # The request's HTTP timeout fired (the SDK's own exception type)
+        if bounded and deadline.expired() and not isinstance(e, DeadlineExceeded):
+            raise DeadlineExceeded(f"Deadline exceeded waiting for {model}") from e
+        raise
+
+
+def _hedged(stage: str, model: str, contents: list, config: Any, budget: float, lease=None) -> str:
+    """
+    Run the call on the pool and race a duplicate against it once it is
+    slower than the hedge delay. Raises FutureTimeout after `budget` seconds;
+    the scheduler slot (`lease`) is then held until the abandoned requests
+    end (their HTTP timeout bounds that to about the same deadline).
+    """
+    with _hedge.lock:
+        _hedge.calls += 1
+    started = threading.Event()
+
+    def send_primary() -> str:
+        started.set()
+        return _send(stage, model, contents, config)
+
+    primary = _hedge_pool.submit(send_primary)
+    running = [primary]
+    try:
+        return _race(stage, model, contents, config, budget, running, started)
+    except FutureTimeout:
+        if lease is not None:
+            for future in running:
+                lease.hold_until(future)
+        raise
+
+
+def _race(stage: str, model: str, contents: list, config: Any, budget: float, running: list,
+          started: threading.Event) -> str:
+    """
+    The hedging race of `_hedged`; every request it starts is appended to
+    `running`. The hedge delay counts from when the primary leaves the pool's
+    queue (`started`): time spent waiting for a pool thread says nothing
+    about the model's latency, and a duplicate would only queue behind it.
+    """
+    give_up = time.monotonic() + budget
+    primary = running[0]
+    delay = _hedge.delay(stage, model)
+    if delay is None or delay >= budget:
+        return primary.result(timeout=None if math.isinf(budget) else budget)
+
+    if not started.wait(timeout=None if math.isinf(budget) else budget):
+        raise FutureTimeout()
+    left = give_up - time.monotonic()
+    done, _ = wait([primary], timeout=delay if math.isinf(budget) else max(0.0, min(delay, left)))
+    if done:
+        return primary.result()
+    if time.monotonic() >= give_up:
+        raise FutureTimeout()
+
+    # Primary is in the tail: race a duplicate against it.
+    with _hedge.lock:
+        _hedge.hedged += 1
+    backup = _hedge_pool.submit(_send, stage, model, contents, config)
+    running.append(backup)
+    pending = {primary, backup}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED,
+                             timeout=None if math.isinf(budget) else max(0.0, give_up - time.monotonic()))
+        if not done:
+            raise FutureTimeout()
+        for future in done:
+            if future.exception() is None:
+                if future is backup:
+                    with _hedge.lock:
+                        _hedge.hedge_wins += 1
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def generate(stage: str, contents: list, validate: Validator | None = None,
+             config: Any = None, hedge: bool = True) -> str:
+    """
+    Call Gemini for `stage` and return the response text.
+    If `validate` raises ValueError, retry on the next stronger tier; the
+    last tier's ValueError propagates. Pass hedge=False for calls that must
+    not be duplicated. Raises DeadlineExceeded once the request's budget is
+    spent (escalation included).
+    """
+    sampled = _routed_below_default(stage) and random.random() < BASELINE_SAMPLE_RATE
+    tiers = tiers_for(stage, baseline=sampled)
+    with _stats.lock:
+        _stats.calls[stage] += 1
+        _stats.sampled[stage] += sampled
+    for attempt, tier in enumerate(tiers):
+        current_deadline().check(stage)
+        with scheduler.slot(stage) if SCHEDULER_ENABLED else nullcontext() as lease:
+            start = time.perf_counter()
+            text = _call(stage, MODEL_TIERS[tier], contents, config, hedge, lease)
+        _stats.record(stage, tier, time.perf_counter() - start)
+        if validate is None:
+            return text
+        try:
+            validate(text)
+            return text
+        except ValueError:
+            if attempt == 0 and not sampled:
+                with _stats.lock:
+                    _stats.escalations[stage] += 1
+            if attempt == len(tiers) - 1:
+                raise
+
+
+def report() -> dict:
+    """
+    Per-stage calls, escalation rate and mean latency per tier, plus an
+    estimate of the latency saved by starting cheap stages below
+    DEFAULT_TIER. Each such stage is compared with its own DEFAULT_TIER
+    attempts (baseline samples and escalations; the latter are harder
+    inputs, so the baseline leans slow); stages with fewer than
+    BASELINE_MIN_SAMPLES of them get no estimate and are listed under
+    "baseline_missing".
+    """
+    with _stats.lock:
+        calls = dict(_stats.calls)
+        escalations = dict(_stats.escalations)
+        sampled = dict(_stats.sampled)
+        latency = {k: list(v) for k, v in _stats.latency.items()}
+
+    stages = {}
+    saved, estimated, missing = 0.0, False, []
+    for stage, n in calls.items():
+        per_tier = {
+            tier: {"attempts": len(v), "mean_s": round(sum(v) / len(v), 3)}
+            for (s, tier), v in latency.items() if s == stage and v
+        }
+        routed = n - sampled.get(stage, 0)
+        stages[stage] = {
+            "calls": n,
+            "escalated": escalations.get(stage, 0),
+            "escalation_rate": round(escalations.get(stage, 0) / routed, 3) if routed else 0.0,
+            "tiers": per_tier,
+        }
+        if not _routed_below_default(stage):
+            continue
+        baseline = latency.get((stage, DEFAULT_TIER), [])
+        stages[stage]["baseline_samples"] = len(baseline)
+        if len(baseline) < BASELINE_MIN_SAMPLES:
+            stages[stage]["latency_saved_s"] = None
+            missing.append(stage)
+            continue
+        spent = sum(sum(v) for (s, _), v in latency.items() if s == stage)
+        stage_saved = n * sum(baseline) / len(baseline) - spent
+        stages[stage]["latency_saved_s"] = round(stage_saved, 2)
+        saved += stage_saved
+        estimated = True
+
+    with _hedge.lock:
+        hedge_report = {
+            "enabled": hedging.enabled,
+            "calls": _hedge.calls,
+            "hedged": _hedge.hedged,
+            "hedge_wins": _hedge.hedge_wins,
+            "hedge_rate": round(_hedge.hedged / _hedge.calls, 3) if _hedge.calls else 0.0,
+        }
+
+    return {
+        "stages": stages,
+        "estimated_latency_saved_s": round(saved, 2) if estimated else None,
+        "baseline_missing": missing,
+        "hedging": hedge_report,
+    }
+
+
+def reset_stats() -> None:
+    global _stats, _hedge
+    _stats = _Stats()
+    _hedge = _HedgeState()
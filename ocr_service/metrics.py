@@ -0,0 +1,52 @@
+# ocr_service/metrics.py
+"""
+Process-wide time accounting for pipeline stages and queues.
+
+    with metrics.timed("render"):
+        ...
+    metrics.snapshot()   # {"render": {"count": 12, "total_s": 3.1, "mean_s": 0.26}, ...}
+
+Names in use:
+  fingerprint, classify, render, upload      time spent in the stage
+  page_queue.renderer_blocked               renderer waiting for OCR to catch up
+  page_queue.ocr_idle                       OCR workers waiting for rendered pages
+  queue_wait.<class>                        model calls waiting for a scheduler slot
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_total = defaultdict(float)
+_count = defaultdict(int)
+
+
+def record(name: str, seconds: float) -> None:
+    with _lock:
+        _total[name] += seconds
+        _count[name] += 1
+
+
+@contextmanager
+def timed(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            name: {"count": _count[name], "total_s": round(total, 3),
+                   "mean_s": round(total / _count[name], 4) if _count[name] else 0.0}
+            for name, total in _total.items()
+        }
+
+
+def reset() -> None:
+    with _lock:
+        _total.clear()
+        _count.clear()
@@ -31,55 +31,170 @@
 #         texts.append(ocr_image_with_gemini(path))
 #     return texts
 
-import time
+import os
+import itertools
 import json
+import queue
 import re
-from google import genai
-from .config import API_KEY, GEMINI_MODEL
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+from . import llm, metrics
 from .classifier import DocumentType
 from .config import PDF_IMAGE_DPI, PAGES_TO_PROCESS, IMAGES_FOLDER
 from .utils.pdf_utils import pdf_to_images
-
-client = genai.Client(api_key=API_KEY)
+from .checkpoints import DocumentCheckpoint, run_stage
+from .config import OPTIONAL_STAGE_RESERVE_S, PAGE_QUEUE_DEPTH, OCR_WORKERS
+from .deadline import current as current_deadline, propagate
 
 
 def ocr_image_with_gemini(image_path: str) -> str:
     """
     Uploads `image_path` to Gemini and polls until text is extracted.
     """
-    gemini_file = client.files.upload(file=image_path)
-    while not getattr(gemini_file, "state", None) or gemini_file.state.name != "ACTIVE":
-        time.sleep(0.5)
-        gemini_file = client.files.get(name=gemini_file.name)
+    gemini_file = llm.upload_file(image_path)
 
     prompt = (
         "Extract **all visible text** from this commercial-registration page. "
         "Return only the extracted text, no commentary."
     )
-    response = client.models.generate_content(
-        model='gemini-2.0-flash',
-        contents=[gemini_file, prompt]
-    )
-    return response.text
+    return llm.generate("ocr", [gemini_file, prompt], validate=llm.expect_text)
+
+
+_DONE = object()
 
 
-def ocr_images(image_paths: list[str], doc_type: DocumentType = None) -> list[str] | dict:
+def iter_ocr(image_paths: Iterable[str], checkpoint: DocumentCheckpoint | None = None,
+             workers: int = OCR_WORKERS, queue_depth: int = PAGE_QUEUE_DEPTH,
+             known_texts: dict[str, str] | None = None) -> Iterator[tuple[int, str]]:
+    """
+    OCR pages as they are produced, yielding (index, text) in completion order.
+
+    `image_paths` may be a lazy iterable (e.g. `iter_pdf_images`): a renderer
+    thread pulls from it into a queue of at most `queue_depth` pages, which
+    `workers` OCR threads drain, so rendering (CPU) overlaps the uploads and
+    model calls (network) and at most `queue_depth` pages wait rendered.
+    Pages after the first are skipped once the deadline runs low. Pages whose
+    text is already known (`known_texts`, keyed by image name such as
+    "page_1") are not sent to OCR.
+    """
+    known_texts = known_texts or {}
+    pages: queue.Queue = queue.Queue(maxsize=queue_depth)
+    stop = threading.Event()
+    deadline = current_deadline()
+
+    def put(item) -> bool:
+        start = time.perf_counter()
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                metrics.record("page_queue.renderer_blocked", time.perf_counter() - start)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def render():
+        try:
+            images = iter(image_paths)
+            for i in itertools.count():
+                start = time.perf_counter()
+                path = next(images, None)
+                if path is None:
+                    break
+                metrics.record("render", time.perf_counter() - start)
+                if not put((i, path)):
+                    return
+        except BaseException as e:
+            put((None, e))
+        finally:
+            for _ in range(workers):
+                put(_DONE)
+
+    def ocr_page(i: int, path: str) -> str | None:
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name in known_texts:
+            return known_texts[name]
+        stage = f"ocr:{name}"
+        if i > 0 and deadline.should_skip(stage, OPTIONAL_STAGE_RESERVE_S):
+            return None
+        return run_stage(checkpoint, stage, ocr_image_with_gemini, path)
+
+    def consume(emit):
+        start = time.perf_counter()
+        while not stop.is_set():
+            try:
+                item = pages.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            metrics.record("page_queue.ocr_idle", time.perf_counter() - start)
+            if item is _DONE:
+                return
+            i, path = item
+            if i is None:
+                raise path       # the renderer failed
+            text = ocr_page(i, path)
+            if text is not None:
+                emit((i, text))
+            start = time.perf_counter()
+
+    results: queue.Queue = queue.Queue()
+    renderer = threading.Thread(target=propagate(render), name="page-renderer", daemon=True)
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="page-ocr")
+    renderer.start()
+    try:
+        futures = [pool.submit(propagate(consume), results.put) for _ in range(workers)]
+        while True:
+            try:
+                item = results.get(timeout=0.05)
+            except queue.Empty:
+                for f in futures:
+                    if f.done() and f.exception() is not None:
+                        raise f.exception()
+                if all(f.done() for f in futures) and results.empty():
+                    return
+                continue
+            yield item
+    finally:
+        stop.set()
+        pool.shutdown(wait=True)
+        renderer.join()
+
+
+def ocr_images(image_paths: Iterable[str], doc_type: DocumentType = None,
+               checkpoint: DocumentCheckpoint | None = None,
+               known_texts: dict[str, str] | None = None) -> list[str] | dict:
     """
     If doc_type is COMMERCIAL_REGISTRATION, do the two-step extraction:
       1) OCR both pages
       2) Per-page prompts to pull out exactly the fields you care about
       3) Aggregate into JSON and return that dict
     Otherwise, just OCR every image and return list of raw texts.
+
+    `image_paths` may be a lazy iterable; pages are OCRed as they arrive
+    (see `iter_ocr`) and the texts are returned in page order. Texts in
+    `known_texts` (e.g. page 1 from fused classification) are reused.
+
+    With a `checkpoint`, every page text and intermediate result is stored,
+    so a retry after a failure resumes from the last completed stage.
+
+    When the deadline runs low, pages after the first are skipped (and the
+    paid-capital step for CR) to leave time for extraction.
     """
-    texts = [ocr_image_with_gemini(p) for p in image_paths]
+    deadline = current_deadline()
+    texts = [text for _, text in sorted(iter_ocr(image_paths, checkpoint, known_texts=known_texts))]
 
-    if doc_type == 'COMMERCIAL_REGISTRATION':
+    if doc_type == DocumentType.COMMERCIAL_REGISTRATION:
         # page‐1: extract fields 1–15
-        page1_kv = extract_page1_fields(texts[0] if len(texts) > 0 else "")
+        page1_kv = run_stage(checkpoint, "cr:page1_fields", extract_page1_fields,
+                             texts[0] if len(texts) > 0 else "")
         # page‐2: extract paid capital
-        page2_kv = extract_page2_fields(texts[1] if len(texts) > 1 else "")
+        page2_kv = ""
+        if len(texts) > 1 and not deadline.should_skip("cr:page2_fields", OPTIONAL_STAGE_RESERVE_S):
+            page2_kv = run_stage(checkpoint, "cr:page2_fields", extract_page2_fields, texts[1])
         # aggregate to JSON
-        return aggregate_fields_to_json(page1_kv, page2_kv)
+        return run_stage(checkpoint, "cr:json", aggregate_fields_to_json, page1_kv, page2_kv)
 
     # fallback: return raw OCR texts
     return texts
@@ -109,8 +224,7 @@ def extract_page1_fields(text: str) -> str:
         f"{text}\n"
         "===END TEXT===\n"
     )
-    resp = client.models.generate_content(model='gemini-2.0-flash', contents=[prompt])
-    return resp.text.strip()
+    return llm.generate("cr_page1_fields", [prompt], validate=llm.expect_text).strip()
 
 
 def extract_page2_fields(text: str) -> str:
@@ -122,8 +236,16 @@ def extract_page2_fields(text: str) -> str:
         f"{text}\n"
         "===END TEXT===\n"
     )
-    resp = client.models.generate_content(model='gemini-2.0-flash', contents=[prompt])
-    return resp.text.strip()
+    return llm.generate("cr_page2_fields", [prompt], validate=llm.expect_text).strip()
+
+
+CR_FIELDS = [
+    "commercial register", "commercial name arabic", "Trade mark arabic",
+    "Trade mark english", "business activity", "commercial establish date",
+    "commencial end date", "term", "commercial expire date", "issued start date",
+    "issued end date", "under law", "issue authorithy", "tax card",
+    "unified register", "paid capital",
+]
 
 
 def aggregate_fields_to_json(kv1: str, kv2: str) -> dict:
@@ -132,15 +254,10 @@ def aggregate_fields_to_json(kv1: str, kv2: str) -> dict:
         "You are given key-value lines from two pages of a commercial-registration document:\n"
         f"{combined}\n"
         "Convert these into a JSON object with these keys in this exact order:\n"
-        "[\"commercial register\",\"commercial name arabic\",\"Trade mark arabic\","
-        "\"Trade mark english\",\"business activity\",\"commercial establish date\","
-        "\"commencial end date\",\"term\",\"commercial expire date\",\"issued start date\","
-        "\"issued end date\",\"under law\",\"issue authorithy\",\"tax card\","
-        "\"unified register\",\"paid capital\"].\n"
+        f"{json.dumps(CR_FIELDS, ensure_ascii=False)}.\n"
         "If any key is missing, set its value to an empty string. Return only valid JSON."
     )
-    resp = client.models.generate_content(model="gemini-2.0-flash", contents=[agg_prompt])
-    raw = resp.text
+    raw = llm.generate("cr_aggregate", [agg_prompt], validate=llm.expect_json(CR_FIELDS))
     clean = re.sub(r"^```(?:json)?\s*|\s*```$", "", raw, flags=re.IGNORECASE).strip()
     return json.loads(clean)
 
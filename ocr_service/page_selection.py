@@ -0,0 +1,172 @@
+# ocr_service/page_selection.py
+import logging
+from dataclasses import dataclass, field
+
+import fitz
+
+from .classifier import DocumentType
+from .config import PAGES_TO_PROCESS, PAGE_SELECTION_THUMB_DPI, BLANK_PAGE_INK_RATIO
+from .utils.image_utils import DARK
+from .utils.text_utils import normalize_arabic, count_phrases
+
+logger = logging.getLogger(__name__)
+
+# Thumbnail rows/columns mostly darkened are table rulings or borders (thin
+# lines come out light gray at thumbnail DPI); this many make a fully ruled page.
+_MARKED = bytes(1 if v < 224 else 0 for v in range(256))
+_RULED_SHARE = 0.6
+_RULED_LINES_FULL = 20
+
+
+@dataclass
+class PagePolicy:
+    """
+    Which pages of a document type are worth sending to OCR.
+      keywords:  phrases marking pages that hold target fields
+      max_pages: hard cap on pages sent to OCR
+      tables:    target fields sit in ruled tables, so scanned pages with
+                 rulings rank higher
+      keep_first: the extraction reads pages by position (page 1 holds the
+                 page-1 fields), so page 1 is always kept and only the
+                 pages after it are ranked
+    """
+    keywords: list[str]
+    max_pages: int
+    tables: bool = False
+    keep_first: bool = False
+
+
+PAGE_POLICIES: dict[DocumentType, PagePolicy] = {
+    DocumentType.NATIONAL_ID: PagePolicy(
+        # Scans without a text layer; several cards may share one PDF.
+        keywords=["بطاقة تحقيق الشخصية", "محل الاقامة", "المهنة"],
+        max_pages=10,
+    ),
+    DocumentType.COMMERCIAL_REGISTRATION: PagePolicy(
+        keywords=["مستخرج سجل تجاري", "تحرر في", "الرقم الموحد للسجل التجاري", "مقدار راس المال"],
+        max_pages=2,
+        keep_first=True,
+    ),
+    DocumentType.TAX_CARD: PagePolicy(
+        keywords=["البطاقة الضريبية", "مصلحة الضرائب", "رقم التسجيل الضريبي", "tax card"],
+        max_pages=2,
+        keep_first=True,
+    ),
+    DocumentType.FINANCIAL_SUMMARY: PagePolicy(
+        keywords=["بنوك التعامل", "مركز مجمع", "البنك المركزي المصري", "اسم العميل", "النشاط"],
+        max_pages=6,
+        tables=True,
+    ),
+}
+
+
+@dataclass
+class PageSelection:
+    """
+    Pages (0-based) to OCR, plus the 1-based pages skipped and why.
+    """
+    pages: list[int] = field(default_factory=list)
+    skipped: list[dict] = field(default_factory=list)
+    unscored: list[dict] = field(default_factory=list)   # kept on layout alone
+
+    def skip(self, index: int, reason: str) -> None:
+        self.skipped.append({"page": index + 1, "reason": reason})
+
+
+@dataclass
+class PageLayout:
+    """
+    What a low-DPI thumbnail shows of a page without a text layer.
+      ink:   fraction of dark pixels
+      ruled: table rulings found, 0..1 (1 = _RULED_LINES_FULL or more)
+    """
+    ink: float
+    ruled: float
+
+    def score(self, tables: bool) -> float:
+        """
+        0..1, below any keyword hit: fuller pages, and ruled ones where the
+        fields sit in tables, first.
+        """
+        return (min(self.ink * 5, 1.0) + (self.ruled if tables else 0.0)) / 2
+
+
+def page_layout(page: fitz.Page, dpi: int = PAGE_SELECTION_THUMB_DPI) -> PageLayout:
+    """
+    Ink density and table rulings of a low-DPI grayscale thumbnail.
+    """
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    samples = pix.samples
+    marked = samples.translate(_MARKED)
+    rows = sum(marked[y * pix.stride:y * pix.stride + pix.width].count(1) >= _RULED_SHARE * pix.width
+               for y in range(pix.height))
+    cols = sum(marked[x::pix.stride].count(1) >= _RULED_SHARE * pix.height for x in range(pix.width))
+    return PageLayout(ink=samples.translate(DARK).count(1) / max(len(samples), 1),
+                      ruled=min((rows + cols) / _RULED_LINES_FULL, 1.0))
+
+
+def select_pages(pdf_path: str, doc_type: DocumentType) -> PageSelection:
+    """
+    Score every page cheaply and keep only those likely to hold target fields:
+      - pages with a text layer are kept if they contain a policy keyword,
+      - scanned pages are dropped if their thumbnail is blank (no ink, no
+        rulings), otherwise
+        scored by layout (ink, table rulings) below any keyword hit,
+      - the survivors are capped at the policy's max_pages, best scores first.
+    If no page matches a keyword, non-blank pages are kept in order up to the
+    cap. With `keep_first`, a non-blank page 1 is always kept and the others
+    compete for the rest of the cap. Types without a policy fall back to the
+    first PAGES_TO_PROCESS pages.
+    Scanned pages kept are listed in `unscored`: nothing checked that they
+    hold target fields.
+    """
+    policy = PAGE_POLICIES.get(doc_type, PagePolicy(keywords=[], max_pages=PAGES_TO_PROCESS, keep_first=True))
+    selection = PageSelection()
+    scored: list[tuple[int, float]] = []   # (page index, score)
+    layouts: dict[int, PageLayout] = {}
+    unmatched: list[int] = []
+
+    doc = fitz.open(pdf_path)
+    for i in range(doc.page_count):
+        page = doc.load_page(i)
+        text = normalize_arabic(page.get_text())
+        if text:
+            score = count_phrases(text, policy.keywords)
+            if score:
+                scored.append((i, score))
+            else:
+                unmatched.append(i)
+            continue
+        layout = page_layout(page)
+        if layout.ink < BLANK_PAGE_INK_RATIO and not layout.ruled:
+            selection.skip(i, f"blank page (ink {layout.ink:.2%})")
+        else:
+            layouts[i] = layout
+            scored.append((i, layout.score(policy.tables)))
+    doc.close()
+
+    if unmatched and not any(score >= 1 for _, score in scored):
+        # No keyword hit at all (unexpected layout): don't trust the scores,
+        # keep pages in order up to the cap.
+        scored = sorted(scored + [(i, 0) for i in unmatched])
+        unmatched = []
+    kept, cap = [], policy.max_pages
+    if policy.keep_first and (any(i == 0 for i, _ in scored) or 0 in unmatched):
+        kept, cap = [0], cap - 1
+        scored = [s for s in scored if s[0] != 0]
+        unmatched = [i for i in unmatched if i != 0]
+    for i in unmatched:
+        selection.skip(i, "no target fields in text layer")
+
+    ranked = sorted(scored, key=lambda s: (-s[1], s[0]))
+    for i, _ in ranked[cap:]:
+        selection.skip(i, f"over the {doc_type.name} page cap ({policy.max_pages})")
+    selection.pages = sorted(kept + [i for i, _ in ranked[:cap]])
+    selection.skipped.sort(key=lambda s: s["page"])
+    selection.unscored = [{"page": i + 1, "ink": round(layouts[i].ink, 4), "ruled": round(layouts[i].ruled, 2)}
+                          for i in selection.pages if i in layouts]
+
+    if selection.skipped:
+        logger.info("%s: OCR pages %s, skipped %s", pdf_path,
+                    [p + 1 for p in selection.pages], selection.skipped)
+    return selection
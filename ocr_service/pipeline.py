@@ -21,28 +21,228 @@
 #     return extractor.extract(pages_text)
 # ocr_service/pipeline.py
 
-from .classifier      import classify_pdf, DocumentType
-from .config          import PDF_IMAGE_DPI, PAGES_TO_PROCESS, IMAGES_FOLDER
-from .utils.pdf_utils import pdf_to_images
-from .ocr             import ocr_images
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from . import llm, metrics
+from .classifier      import classify_pdf, classify_pdf_with_text, DocumentType
+from .config          import (PDF_IMAGE_DPI, PAGES_TO_PROCESS, IMAGES_FOLDER, SEGMENT_WORKERS,
+                              PAGE_SELECTION_ENABLED, FINANCIAL_LOCAL_EXTRACTION,
+                              DEFAULT_DOCUMENT_BUDGET_S, DOCUMENT_BUDGETS_S, DEDUP_ENABLED,
+                              FUSED_CLASSIFY_OCR)
+from .utils.pdf_utils import iter_pdf_images, pdf_to_images
+from .ocr             import ocr_images, ocr_image_with_gemini
 from .extractors.base import get_extractor_for
+from .checkpoints     import DocumentCheckpoint, for_document, run_stage
+from .segmentation    import segment_pdf, write_segment
+from .page_selection  import select_pages
+from .deadline        import Deadline, current as current_deadline, use as use_deadline, propagate
+from .dedup           import fingerprint, get_index, text_signature
+from .scheduler       import priority as use_priority, current_priority
+
+def process_document(pdf_path: str, deadline: Deadline | None = None,
+                     priority: str | None = None) -> dict:
+    # Model calls are scheduled as `priority` ("interactive" / "batch"),
+    # by default the priority of the caller (config.DEFAULT_PRIORITY).
+    # Uploads made for this document are held until it is done; afterwards
+    # the file registry keeps them for reuse and deletes them once idle.
+    # Page images go to a folder of their own, so documents processed
+    # concurrently don't overwrite each other's page_N.jpg.
+    os.makedirs(IMAGES_FOLDER, exist_ok=True)
+    with use_priority(priority or current_priority()), llm.files.scope(), \
+            tempfile.TemporaryDirectory(dir=IMAGES_FOLDER) as images_folder:
+        return _process_document(pdf_path, deadline, images_folder)
+
+
+def _process_document(pdf_path: str, deadline: Deadline | None, images_folder: str) -> dict:
+    # Stage outputs are checkpointed per document hash, so a retry of a
+    # failed run resumes from the last completed stage.
+    checkpoint = for_document(pdf_path)
+
+    # Classification runs under DEFAULT_DOCUMENT_BUDGET_S, the rest under the
+    # budget of the detected type; both count from now and never outlast
+    # the caller's `deadline`.
+    start = time.monotonic()
+    outer = deadline or Deadline()
+    known_texts = {}
+
+    # A rescan of a document processed within DEDUP_WINDOW_S (near-identical
+    # page hashes and the same page-1 words) gets the stored result. Scans
+    # have no text layer, so their page 1 is transcribed first (and reused
+    # by extraction when there is no match).
+    fp = None
+    if DEDUP_ENABLED:
+        with metrics.timed("fingerprint"):
+            fp = fingerprint(pdf_path)
+        if not fp.page_words:
+            with use_deadline(outer.within(DEFAULT_DOCUMENT_BUDGET_S, start)):
+                known_texts["page_1"] = run_stage(checkpoint, "ocr:page_1", _ocr_first_page,
+                                                  pdf_path, images_folder)
+            fp.page_words = text_signature(known_texts["page_1"])
+        match = get_index().find_similar(fp)
+        if match:
+            if checkpoint:
+                checkpoint.clear()
+            return attach_meta(match["result"], document_type=match["doc_type"], near_duplicate_of={
+                "id": match["id"],
+                "source": match["source"],
+                "distance": match["distance"],
+                "word_similarity": match["word_similarity"],
+                "processed_at": match["created_at"],
+            })
 
-def process_document(pdf_path: str) -> dict:
-    # 1. classify
-    doc_type = classify_pdf(pdf_path)
+    # 1. classify (with FUSED_CLASSIFY_OCR, page 1 is transcribed by the same
+    #    call, unless it already was above)
+    with use_deadline(outer.within(DEFAULT_DOCUMENT_BUDGET_S, start)), metrics.timed("classify"):
+        if FUSED_CLASSIFY_OCR and "page_1" not in known_texts:
+            label, known_texts["page_1"] = run_stage(checkpoint, "classify_ocr", _classify_fused,
+                                                     pdf_path, images_folder)
+            doc_type = DocumentType[label]
+        else:
+            doc_type = DocumentType[run_stage(checkpoint, "classify",
+                                              lambda: classify_pdf(pdf_path, images_folder).name)]
     print(doc_type)
+    budget = DOCUMENT_BUDGETS_S.get(doc_type.name, DEFAULT_DOCUMENT_BUDGET_S)
+    with use_deadline(outer.within(budget, start)) as doc_deadline:
+        result = extract_document(pdf_path, doc_type, checkpoint, images_folder, known_texts)
+    attach_meta(result, document_type=doc_type.name)
+    if not doc_deadline.partial:
+        if fp is not None:
+            get_index().add(os.path.basename(pdf_path), fp, doc_type.name, result)
+        # Done: the stage outputs were only kept for a retry.
+        if checkpoint:
+            checkpoint.clear()
+    return result
+
+
+def _classify_fused(pdf_path: str, images_folder: str) -> list[str]:
+    doc_type, text = classify_pdf_with_text(pdf_path, images_folder)
+    return [doc_type.name, text]
+
+
+def _ocr_first_page(pdf_path: str, images_folder: str) -> str:
+    images = pdf_to_images(pdf_path, images_folder, dpi=PDF_IMAGE_DPI, max_pages=1)
+    if not images:
+        raise FileNotFoundError(f"No pages converted from {pdf_path}")
+    return ocr_image_with_gemini(images[0])
+
+
+def extract_document(pdf_path: str, doc_type: DocumentType,
+                     checkpoint: DocumentCheckpoint | None = None,
+                     images_folder: str = IMAGES_FOLDER,
+                     known_texts: dict[str, str] | None = None) -> dict:
+    """
+    Run the extraction path of an already-classified document, within the
+    current deadline. Stages skipped to stay within it are listed under
+    '_meta.degraded', with '_meta.partial' set. `known_texts` are page texts
+    already transcribed (e.g. {"page_1": ...}), which are not OCRed again.
+    """
+    result = _extract(pdf_path, doc_type, checkpoint, images_folder, known_texts)
+    deadline = current_deadline()
+    if deadline.partial:
+        attach_meta(result, partial=True, degraded=list(deadline.degraded))
+    return result
+
+
+def _extract(pdf_path: str, doc_type: DocumentType, checkpoint: DocumentCheckpoint | None,
+             images_folder: str, known_texts: dict[str, str] | None) -> dict:
     extractor = get_extractor_for(doc_type)
 
     # 2. For personal or company credit-score, pass PDF directly
     if doc_type in (DocumentType.ISCORE_INDIVIDUAL, DocumentType.ISCORE_COMPANY):
-        return extractor.extract(pdf_path)
+        return extractor.extract(pdf_path, checkpoint=checkpoint)
+
+    # Financial summaries with a text layer are parsed locally; Gemini only
+    # fills the fields the local parser missed.
+    if doc_type == DocumentType.FINANCIAL_SUMMARY and FINANCIAL_LOCAL_EXTRACTION:
+        result = run_stage(checkpoint, "financial:text_layer", extractor.extract_pdf, pdf_path)
+        if result is not None:
+            return result
 
-    # 3. Otherwise, do PDF→images→OCR
-    images = pdf_to_images(pdf_path, IMAGES_FOLDER, dpi=PDF_IMAGE_DPI, max_pages=PAGES_TO_PROCESS)
-    if doc_type !='COMMERCIAL_REGISTRATION':
-        pages_text = ocr_images(images)
+    # 3. Otherwise, pick the pages worth OCRing, then PDF→images→OCR
+    #    (streamed: each page is OCRed as soon as it is rendered)
+    meta = {}
+    current_deadline().check("render")
+    if PAGE_SELECTION_ENABLED:
+        selection = select_pages(pdf_path, doc_type)
+        images = iter_pdf_images(pdf_path, images_folder, dpi=PDF_IMAGE_DPI, pages=selection.pages)
+        meta["pages_processed"] = [p + 1 for p in selection.pages]
+        meta["pages_skipped"] = selection.skipped
+        if selection.unscored:
+            meta["pages_unscored"] = selection.unscored
     else:
-        pages_text = ocr_images(images,'COMMERCIAL_REGISTRATION')
-        return pages_text
-    # 4. extract fields from text
-    return extractor.extract(pages_text)
+        images = iter_pdf_images(pdf_path, images_folder, dpi=PDF_IMAGE_DPI, max_pages=PAGES_TO_PROCESS)
+    pages_text = ocr_images(images, checkpoint=checkpoint, known_texts=known_texts)
+    # 4. extract fields from text (commercial registrations in one call over
+    #    every page, checkpointed like the OCR it depends on)
+    if doc_type == DocumentType.COMMERCIAL_REGISTRATION:
+        return attach_meta(run_stage(checkpoint, "cr:extract", extractor.extract, pages_text), **meta)
+    return attach_meta(extractor.extract(pages_text), **meta)
+
+
+def attach_meta(result, **meta):
+    """
+    Record pipeline metadata under a '_meta' key of the result (of every
+    record, when an extractor returns several).
+    """
+    if not meta:
+        return result
+    for record in (result if isinstance(result, list) else [result]):
+        if isinstance(record, dict):
+            record.setdefault("_meta", {}).update(meta)
+    return result
+
+
+def _is_partial(result) -> bool:
+    records = result if isinstance(result, list) else [result]
+    return any(isinstance(r, dict) and r.get("_meta", {}).get("partial") for r in records)
+
+
+def process_bundle(pdf_path: str, max_workers: int = SEGMENT_WORKERS,
+                   extract_fn: Callable[..., dict] = extract_document,
+                   deadline: Deadline | None = None, priority: str | None = None) -> list[dict]:
+    """
+    Process a PDF that may hold several documents (e.g. a national ID, a tax
+    card and a commercial registration scanned together):
+      1. label every page cheaply and group contiguous pages into segments,
+      2. run the matching extractor for each segment in parallel,
+      3. return one typed result per segment, in page order.
+    A failing segment is reported with an 'error' instead of a 'result'.
+    Each segment gets the budget of its document type from when it starts,
+    within the overall `deadline` if one is given. Model calls are
+    scheduled as `priority` (default: the caller's).
+    """
+    checkpoint = for_document(pdf_path)
+    outer = deadline or Deadline()
+    with use_priority(priority or current_priority()), llm.files.scope(), use_deadline(outer), \
+            tempfile.TemporaryDirectory() as work_dir:
+        segments = segment_pdf(pdf_path)
+
+        def run(index, segment):
+            seg_dir = os.path.join(work_dir, f"segment_{index + 1}")
+            seg_pdf = write_segment(pdf_path, segment, seg_dir)
+            seg_checkpoint = checkpoint.child(f"pages={segment.pages[0] + 1}-{segment.pages[-1] + 1}") if checkpoint else None
+            budget = DOCUMENT_BUDGETS_S.get(segment.doc_type.name, DEFAULT_DOCUMENT_BUDGET_S)
+            with use_deadline(outer.within(budget)):
+                return extract_fn(seg_pdf, segment.doc_type, seg_checkpoint, images_folder=seg_dir)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(propagate(run), i, s) for i, s in enumerate(segments)]
+            results = []
+            for segment, future in zip(segments, futures):
+                entry = {
+                    "document_type": segment.doc_type.name,
+                    "pages": [p + 1 for p in segment.pages],
+                }
+                try:
+                    entry["result"] = future.result()
+                except Exception as e:
+                    entry["error"] = f"{type(e).__name__}: {e}"
+                results.append(entry)
+    # Keep the segments' checkpoints only while some of them need a retry.
+    if checkpoint and all("result" in r and not _is_partial(r["result"]) for r in results):
+        checkpoint.clear()
+    return results
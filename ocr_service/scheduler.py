@@ -0,0 +1,252 @@
+# ocr_service/scheduler.py
+"""
+Priority scheduling of model calls.
+
+Interactive requests (a user waiting in the Streamlit app) and batch work
+(backfills) share one quota. Every model call takes a slot from a Scheduler
+first; at most `capacity` calls are in flight. When a slot frees up, the
+waiting classes share it by weight (stride scheduling: interactive 4 :
+batch 1 means four interactive calls start for every batch call while both
+are waiting), with two guards:
+
+  - reserved slots: `reserved={"interactive": 2}` keeps 2 slots that no other
+    class may take, so a batch flood never fills every slot;
+  - starvation: a call queued for `starvation_s` goes next, whatever its class.
+
+The class of a call comes from the running request, like its deadline:
+
+    with scheduler.priority("batch"):
+        process_document(path)
+
+Queue wait is recorded per class (`stats()` and ocr_service.metrics as
+"queue_wait.<class>").
+
+`capacity` caps throughput at capacity / latency calls per second, so size
+it from the quota (`capacity_for`): much below what the quota sustains,
+batch work runs slower than with no scheduler at all; much above it,
+calls queue on the quota instead, where priority doesn't apply.
+"""
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from . import metrics
+from .config import (MAX_INFLIGHT_CALLS, PRIORITY_WEIGHTS, RESERVED_SLOTS, STARVATION_S,
+                     DEFAULT_PRIORITY)
+from .deadline import DeadlineExceeded, current as current_deadline
+
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar("priority", default=DEFAULT_PRIORITY)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+@contextmanager
+def priority(name: str):
+    """
+    Run the block (and the worker threads it propagates its context to)
+    as priority class `name`.
+    """
+    token = _priority.set(name)
+    try:
+        yield name
+    finally:
+        _priority.reset(token)
+
+
+def capacity_for(rpm: int, latency_s: float, headroom: float = 1.5) -> int:
+    """
+    Slots needed to keep `rpm` calls per minute in flight when a call takes
+    `latency_s` on average (Little's law), with `headroom` for the tail.
+    """
+    return max(1, math.ceil(rpm / 60 * latency_s * headroom))
+
+
+class _Lease:
+    """
+    A granted slot. It is released when the `slot()` block exits, or later
+    if calls the block gave up on (`hold_until`) are still running then.
+    """
+
+    def __init__(self, release):
+        self._release = release
+        self._lock = threading.Lock()
+        self._holds = 1         # the block itself
+
+    def hold_until(self, future) -> None:
+        """
+        Keep the slot until `future` is done (a call abandoned at the
+        deadline still occupies the connection and the quota).
+        """
+        with self._lock:
+            self._holds += 1
+        future.add_done_callback(lambda _: self._drop())
+
+    def _drop(self) -> None:
+        with self._lock:
+            self._holds -= 1
+            last = self._holds == 0
+        if last:
+            self._release()
+
+
+@dataclass(eq=False)     # identity: a timed-out waiter removes itself, not an equal one
+class _Waiter:
+    queued_at: float
+    granted: bool = False
+
+
+@dataclass
+class _Class:
+    weight: float
+    reserved: int = 0
+    waiting: deque = field(default_factory=deque)
+    inflight: int = 0
+    passes: float = 0.0         # stride-scheduling virtual time
+    granted: int = 0
+    starved: int = 0            # grants made by the starvation guard
+    wait_total_s: float = 0.0
+    wait_max_s: float = 0.0
+
+
+class Scheduler:
+    """
+    Weighted fair admission of calls from several priority classes into
+    `capacity` slots.
+    """
+
+    def __init__(self, capacity: int = MAX_INFLIGHT_CALLS, weights: dict[str, float] = PRIORITY_WEIGHTS,
+                 reserved: dict[str, int] = RESERVED_SLOTS, starvation_s: float = STARVATION_S):
+        unknown = set(reserved) - set(weights)
+        if unknown:
+            raise ValueError(f"Reserved slots for unknown classes: {sorted(unknown)}")
+        if sum(reserved.values()) >= capacity:
+            raise ValueError(f"Reserved slots ({sum(reserved.values())}) must leave room in a capacity of {capacity}")
+        self.capacity = capacity
+        self.starvation_s = starvation_s
+        self._classes = {name: _Class(weight, reserved.get(name, 0)) for name, weight in weights.items()}
+        self._cond = threading.Condition()
+
+    def _class(self, name: str) -> _Class:
+        cls = self._classes.get(name)
+        if cls is None:
+            raise ValueError(f"Unknown priority class '{name}'; expected one of {sorted(self._classes)}")
+        return cls
+
+    def _can_start(self, name: str) -> bool:
+        """
+        A free slot exists that isn't held back for another class.
+        """
+        inflight = sum(c.inflight for c in self._classes.values())
+        held_back = sum(max(0, c.reserved - c.inflight) for n, c in self._classes.items() if n != name)
+        return inflight + held_back < self.capacity
+
+    def _dispatch(self) -> None:
+        """
+        Grant free slots to waiters (caller holds the lock).
+        """
+        now = time.monotonic()
+        while True:
+            ready = [(name, c) for name, c in self._classes.items() if c.waiting and self._can_start(name)]
+            if not ready:
+                return
+            starving = [(c.waiting[0].queued_at, name) for name, c in ready
+                        if now - c.waiting[0].queued_at >= self.starvation_s]
+            if starving:
+                name = min(starving)[1]
+                cls = self._classes[name]
+                cls.starved += 1
+            else:
+                name, cls = min(ready, key=lambda item: item[1].passes)
+            waiter = cls.waiting.popleft()
+            waiter.granted = True
+            cls.inflight += 1
+            cls.granted += 1
+            cls.passes += 1 / cls.weight
+            self._cond.notify_all()
+
+    def acquire(self, name: str | None = None, timeout: float | None = None) -> bool:
+        """
+        Wait for a slot for class `name` (default: the current priority).
+        Returns False if none was granted within `timeout` seconds.
+        """
+        name = name or current_priority()
+        start = time.monotonic()
+        with self._cond:
+            cls = self._class(name)
+            if not cls.waiting and not cls.inflight:
+                # A class that was idle starts level with the active ones
+                # instead of cashing in the turns it didn't need.
+                active = [c.passes for c in self._classes.values() if c.waiting or c.inflight]
+                if active:
+                    cls.passes = max(cls.passes, min(active))
+            waiter = _Waiter(start)
+            cls.waiting.append(waiter)
+            self._dispatch()
+            give_up = None if timeout is None else start + timeout
+            while not waiter.granted:
+                # Wake up periodically: a waiter may start starving without
+                # any slot being released.
+                left = None if math.isinf(self.starvation_s) else self.starvation_s
+                if give_up is not None:
+                    remaining = give_up - time.monotonic()
+                    if remaining <= 0:
+                        cls.waiting.remove(waiter)
+                        return False
+                    left = remaining if left is None else min(left, remaining)
+                self._cond.wait(left)
+                if not waiter.granted:
+                    self._dispatch()
+            waited = time.monotonic() - start
+            cls.wait_total_s += waited
+            cls.wait_max_s = max(cls.wait_max_s, waited)
+        metrics.record(f"queue_wait.{name}", waited)
+        return True
+
+    def release(self, name: str | None = None) -> None:
+        name = name or current_priority()
+        with self._cond:
+            cls = self._class(name)
+            if cls.inflight <= 0:
+                raise ValueError(f"release() without a slot held by '{name}'")
+            cls.inflight -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, stage: str = "model call"):
+        """
+        Hold a slot of the current priority class for the block. Waits at
+        most for the remaining budget of the running request, then raises
+        DeadlineExceeded. Yields the slot's lease (see `_Lease.hold_until`).
+        """
+        name = current_priority()
+        deadline = current_deadline()
+        timeout = None if deadline.expires_at is None else deadline.remaining()
+        if not self.acquire(name, timeout):
+            raise DeadlineExceeded(f"Deadline exceeded queued for '{stage}' ({name})")
+        lease = _Lease(lambda: self.release(name))
+        try:
+            yield lease
+        finally:
+            lease._drop()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                name: {
+                    "weight": c.weight,
+                    "reserved": c.reserved,
+                    "inflight": c.inflight,
+                    "waiting": len(c.waiting),
+                    "granted": c.granted,
+                    "starved": c.starved,
+                    "mean_wait_s": round(c.wait_total_s / c.granted, 3) if c.granted else 0.0,
+                    "max_wait_s": round(c.wait_max_s, 3),
+                }
+                for name, c in self._classes.items()
+            }
@@ -0,0 +1,167 @@
+# ocr_service/segmentation.py
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from .classifier import DocumentType, classify_image
+from .config import SEGMENT_CLASSIFY_DPI, SEGMENT_WORKERS
+from .deadline import propagate
+from .utils.pdf_utils import pdf_to_images, pdf_page_texts, extract_pdf_pages
+from .utils.text_utils import normalize_arabic, count_phrases
+
+# Phrases that identify a document type from a page's text layer.
+# Arabic phrases also match when the text layer stores them visually reversed.
+PAGE_KEYWORDS: dict[DocumentType, list[str]] = {
+    DocumentType.NATIONAL_ID: [
+        "بطاقة تحقيق الشخصية", "national id card",
+    ],
+    DocumentType.COMMERCIAL_REGISTRATION: [
+        "مستخرج سجل تجاري", "الرقم الموحد للسجل التجاري", "مقدار راس المال",
+        "commercial registration",
+    ],
+    DocumentType.TAX_CARD: [
+        "البطاقة الضريبية", "بطاقة ضريبية", "مصلحة الضرائب", "tax card",
+    ],
+    DocumentType.FINANCIAL_SUMMARY: [
+        "البنك المركزي المصري", "بنوك التعامل", "مركز مجمع", "central bank of egypt",
+    ],
+}
+
+# iScore reports share a header; company vs individual is told apart by markers.
+ISCORE_KEYWORDS = ["استعلام الائتماني", "i-score", "iscore", "credit score report"]
+ISCORE_COMPANY_MARKERS = ["بيانات المنشاة", "corporate", "company profile"]
+ISCORE_INDIVIDUAL_MARKERS = ["تاريخ الميلاد", "personal", "consumer"]
+
+# Titles printed only on the first page of a document: a page carrying one
+# starts a new document even right after another of the same type. iScore
+# reports have none (their header repeats on every page), so consecutive
+# reports of one kind stay one segment.
+FIRST_PAGE_HEADINGS: dict[DocumentType, list[str]] = {
+    DocumentType.NATIONAL_ID: ["بطاقة تحقيق الشخصية", "national id card"],
+    DocumentType.COMMERCIAL_REGISTRATION: ["مستخرج سجل تجاري", "commercial registration"],
+    DocumentType.TAX_CARD: ["البطاقة الضريبية", "بطاقة ضريبية", "tax card"],
+    DocumentType.FINANCIAL_SUMMARY: ["مركز مجمع"],
+}
+
+
+@dataclass
+class Segment:
+    """
+    A run of contiguous pages (0-based indices) of one document type.
+    """
+    doc_type: DocumentType
+    pages: list[int] = field(default_factory=list)
+
+
+def classify_page_text(text: str) -> DocumentType | None:
+    """
+    Label a page from its text layer alone. Returns None if nothing matches,
+    which for a non-empty page usually means a continuation page.
+    """
+    norm = normalize_arabic(text)
+    if not norm:
+        return None
+
+    if count_phrases(norm, ISCORE_KEYWORDS):
+        company = count_phrases(norm, ISCORE_COMPANY_MARKERS)
+        individual = count_phrases(norm, ISCORE_INDIVIDUAL_MARKERS)
+        if company != individual:
+            return DocumentType.ISCORE_COMPANY if company > individual else DocumentType.ISCORE_INDIVIDUAL
+
+    scores = {t: count_phrases(norm, kws) for t, kws in PAGE_KEYWORDS.items()}
+    best = max(scores.values())
+    winners = [t for t, s in scores.items() if s == best]
+    if best == 0 or len(winners) > 1:
+        return None
+    return winners[0]
+
+
+def is_first_page(text: str, doc_type: DocumentType) -> bool:
+    """
+    Whether a page's text carries a first-page title of `doc_type`.
+    """
+    return bool(count_phrases(normalize_arabic(text), FIRST_PAGE_HEADINGS.get(doc_type, [])))
+
+
+def _classify_thumbnail(image_path: str) -> DocumentType | None:
+    return classify_image(image_path, allow_continuation=True)
+
+
+def label_pages(pdf_path: str, max_workers: int = SEGMENT_WORKERS) -> tuple[list[DocumentType | None], list[bool]]:
+    """
+    Label every page of a PDF as cheaply as possible:
+      1. pages with a text layer are matched against PAGE_KEYWORDS locally,
+      2. pages without one (scans) are sent to Gemini as low-DPI thumbnails.
+    Pages that have text but no keywords, and scans Gemini sees no heading
+    on, are left as None (continuations).
+    Also returns which pages start a document: text pages with a
+    FIRST_PAGE_HEADINGS title, and scans labelled with a type (only a
+    heading earns a scan its label).
+    """
+    texts = pdf_page_texts(pdf_path)
+    labels: list[DocumentType | None] = [classify_page_text(t) for t in texts]
+    starts = [label is not None and is_first_page(t, label) for t, label in zip(texts, labels)]
+    scanned = [i for i, t in enumerate(texts) if not t.strip()]
+    if not scanned:
+        return labels, starts
+
+    with tempfile.TemporaryDirectory() as thumbs_dir:
+        thumbs = pdf_to_images(pdf_path, thumbs_dir, dpi=SEGMENT_CLASSIFY_DPI, pages=scanned)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for i, doc_type in zip(scanned, pool.map(propagate(_classify_thumbnail), thumbs)):
+                labels[i] = doc_type
+                starts[i] = doc_type is not None
+    return labels, starts
+
+
+def classify_pages(pdf_path: str, max_workers: int = SEGMENT_WORKERS) -> list[DocumentType | None]:
+    """
+    The page labels of `label_pages`.
+    """
+    return label_pages(pdf_path, max_workers)[0]
+
+
+def group_segments(labels: list[DocumentType | None], starts: list[bool] | None = None) -> list[Segment]:
+    """
+    Group contiguous pages of the same type into segments. Unlabelled pages
+    are attached to the preceding segment (or the next one if they lead).
+    A page marked in `starts` (a first page) opens a new segment even after
+    a segment of its own type: extractors other than the national ID one
+    return a single record per document, so two documents in one segment
+    would lose one of them.
+    """
+    starts = starts or [False] * len(labels)
+    segments: list[Segment] = []
+    leading: list[int] = []
+    for i, doc_type in enumerate(labels):
+        if doc_type is None:
+            if segments:
+                segments[-1].pages.append(i)
+            else:
+                leading.append(i)
+        elif segments and segments[-1].doc_type == doc_type and not starts[i]:
+            segments[-1].pages.append(i)
+        else:
+            segments.append(Segment(doc_type, leading + [i]))
+            leading = []
+    return segments
+
+
+def segment_pdf(pdf_path: str) -> list[Segment]:
+    """
+    Split a (possibly multi-document) PDF into typed segments.
+    """
+    segments = group_segments(*label_pages(pdf_path))
+    if not segments:
+        raise ValueError(f"Could not classify any page of {pdf_path}")
+    return segments
+
+
+def write_segment(pdf_path: str, segment: Segment, output_folder: str) -> str:
+    """
+    Save a segment's pages as a standalone PDF and return its path.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    name = f"segment_{segment.pages[0] + 1}-{segment.pages[-1] + 1}_{segment.doc_type.name.lower()}.pdf"
+    return extract_pdf_pages(pdf_path, segment.pages, os.path.join(output_folder, name))
@@ -1 +1,5 @@
-# Placeholder for ocr_service/utils/image_utils.py
+# utils/image_utils.py
+
+# Byte translation table: grayscale value -> 1 if "ink", else 0, so
+# `samples.translate(DARK).count(1)` counts the ink pixels of a csGRAY pixmap
+DARK = bytes(1 if v < 160 else 0 for v in range(256))
@@ -0,0 +1,89 @@
+# utils/national_id.py
+
+import re
+from datetime import date
+
+from .text_utils import to_english_digits
+
+# Governorate of birth, digits 8-9 of the national ID number.
+GOVERNORATES = {
+    "01": "Cairo", "02": "Alexandria", "03": "Port Said", "04": "Suez",
+    "11": "Damietta", "12": "Dakahlia", "13": "Sharqia", "14": "Qalyubia",
+    "15": "Kafr El Sheikh", "16": "Gharbia", "17": "Monufia", "18": "Beheira",
+    "19": "Ismailia", "21": "Giza", "22": "Beni Suef", "23": "Fayoum",
+    "24": "Minya", "25": "Asyut", "26": "Sohag", "27": "Qena", "28": "Aswan",
+    "29": "Luxor", "31": "Red Sea", "32": "New Valley", "33": "Matrouh",
+    "34": "North Sinai", "35": "South Sinai", "88": "Born abroad",
+}
+
+# First digit: century of birth.
+CENTURIES = {"2": 1900, "3": 2000}
+
+_CHECK_WEIGHTS = (2, 7, 6, 5, 4, 3, 2, 7, 6, 5, 4, 3, 2)
+
+
+def normalize_national_id(value: str) -> str:
+    """
+    Keep only the digits of `value` (Arabic-Indic digits converted).
+    """
+    return re.sub(r"\D", "", to_english_digits(value or ""))
+
+
+def check_digit(first13: str) -> int:
+    """
+    Expected 14th digit: weighted sum of the first 13 digits, mod 11.
+    """
+    total = sum(int(d) * w for d, w in zip(first13, _CHECK_WEIGHTS))
+    return (11 - total % 11) % 10
+
+
+def decode_national_id(value: str) -> dict:
+    """
+    Decode an Egyptian national ID number:
+
+        C YYMMDD GG SSSG K
+        C: century (2 = 1900s, 3 = 2000s)   GG: governorate of birth
+        SSSG: sequence, odd last digit = male   K: check digit
+
+    Returns a dict with national_id_number, date_of_birth (YYYY-MM-DD),
+    gender, governorate, checksum_ok, and `errors` listing every structural
+    problem found (empty when the number is valid). A wrong check digit is
+    reported through checksum_ok only, since it alone doesn't make the
+    derived fields wrong.
+    """
+    number = normalize_national_id(value)
+    result = {
+        "national_id_number": number,
+        "date_of_birth": "",
+        "gender": "",
+        "governorate": "",
+        "checksum_ok": False,
+        "errors": [],
+    }
+    if len(number) != 14:
+        result["errors"].append(f"expected 14 digits, got {len(number)}")
+        return result
+
+    century = CENTURIES.get(number[0])
+    if century is None:
+        result["errors"].append(f"unknown century digit '{number[0]}'")
+    else:
+        try:
+            born = date(century + int(number[1:3]), int(number[3:5]), int(number[5:7]))
+        except ValueError:
+            result["errors"].append(f"invalid birth date '{number[1:7]}'")
+        else:
+            if born > date.today():
+                result["errors"].append(f"birth date {born} is in the future")
+            else:
+                result["date_of_birth"] = born.isoformat()
+
+    governorate = GOVERNORATES.get(number[7:9])
+    if governorate is None:
+        result["errors"].append(f"unknown governorate code '{number[7:9]}'")
+    else:
+        result["governorate"] = governorate
+
+    result["gender"] = "Male" if int(number[12]) % 2 else "Female"
+    result["checksum_ok"] = check_digit(number[:13]) == int(number[13])
+    return result
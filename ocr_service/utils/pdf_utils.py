@@ -3,26 +3,72 @@
 
 import fitz
 import os
+import tempfile
+from typing import Iterator
 
-def pdf_to_images(pdf_path: str, output_folder: str, dpi: int = 150, max_pages: int = 2) -> list[str]:
+from .rasterizer import iter_rendered
+
+def pdf_to_images(pdf_path: str, output_folder: str, dpi: int = 150, max_pages: int = 2,
+                  pages: list[int] | None = None) -> list[str]:
     """
     Converts up to `max_pages` of the PDF into JPEGs at `dpi`.
+    If `pages` (0-based indices) is given, exactly those pages are converted.
     Returns list of image paths.
     """
+    return list(iter_pdf_images(pdf_path, output_folder, dpi, max_pages, pages))
+
+
+def iter_pdf_images(pdf_path: str, output_folder: str, dpi: int = 150, max_pages: int = 2,
+                    pages: list[int] | None = None) -> Iterator[str]:
+    """
+    Like `pdf_to_images`, but yields each image path as soon as the page is
+    saved, so consumers (OCR) can start before the last page is rendered.
+    Long page lists are rendered on the rasterizer's worker processes.
+    """
     if not os.path.exists(pdf_path):
         raise FileNotFoundError(f"Cannot find PDF file: {pdf_path}")
 
     os.makedirs(output_folder, exist_ok=True)
-    doc = fitz.open(pdf_path)
-    pages_to_do = min(max_pages, doc.page_count)
-    image_paths = []
+    if pages is None:
+        with fitz.open(pdf_path) as doc:
+            pages = range(min(max_pages, doc.page_count))
+    yield from iter_rendered(pdf_path, pages, output_folder, dpi)
+
 
-    for i in range(pages_to_do):
-        page = doc.load_page(i)
-        pix = page.get_pixmap(dpi=dpi, alpha=False)
-        img_path = os.path.join(output_folder, f"page_{i+1}.jpg")
-        pix.save(img_path, output="jpg")
-        image_paths.append(img_path)
+def pdf_to_pngs(pdf_path: str, dpi: int = 108) -> list[bytes]:
+    """
+    PNG bytes of every page (e.g. for a viewer), rendered on the
+    rasterizer's worker processes.
+    """
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+    with tempfile.TemporaryDirectory() as tmp:
+        pngs = []
+        for path in iter_rendered(pdf_path, range(page_count), tmp, dpi, fmt="png"):
+            with open(path, "rb") as f:
+                pngs.append(f.read())
+        return pngs
 
+
+def pdf_page_texts(pdf_path: str) -> list[str]:
+    """
+    Text layer of every page (empty strings for scanned pages).
+    """
+    doc = fitz.open(pdf_path)
+    texts = [doc.load_page(i).get_text() for i in range(doc.page_count)]
     doc.close()
-    return image_paths
+    return texts
+
+
+def extract_pdf_pages(pdf_path: str, pages: list[int], output_path: str) -> str:
+    """
+    Write the given 0-based `pages` of a PDF to a new PDF at `output_path`.
+    """
+    src = fitz.open(pdf_path)
+    dst = fitz.open()
+    for i in pages:
+        dst.insert_pdf(src, from_page=i, to_page=i)
+    dst.save(output_path)
+    dst.close()
+    src.close()
+    return output_path
@@ -0,0 +1,136 @@
+# ocr_service/utils/rasterizer.py
+"""
+Page rendering on a pool of worker processes.
+
+PyMuPDF renders on the calling thread and a Document can't be shared between
+threads, so a long scan at 300 DPI keeps one core busy while the others sit
+idle. Here the pages are split into runs of at most RASTER_CHUNK_PAGES; each
+worker process opens its own handle of the PDF, renders its run and saves
+the encoded images to the output folder, and only the paths travel back.
+Jobs shorter than RASTER_MIN_PAGES render in the calling process, where
+they don't pay for the round trip. At most one run per worker is in flight,
+so a slow consumer holds rendering back instead of filling the disk.
+"""
+import atexit
+import math
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator
+
+import fitz
+
+from ..config import RASTER_PROCESSES, RASTER_MAX_PROCESSES, RASTER_MIN_PAGES, RASTER_CHUNK_PAGES
+
+
+def _render_page(doc: fitz.Document, index: int, output_folder: str, dpi: int, fmt: str) -> str:
+    pix = doc.load_page(index).get_pixmap(dpi=dpi, alpha=False)
+    path = os.path.join(output_folder, f"page_{index + 1}.{fmt}")
+    pix.save(path, output=fmt)
+    return path
+
+
+def render_range(pdf_path: str, pages: list[int], output_folder: str, dpi: int, fmt: str = "jpg") -> list[str]:
+    """
+    Render `pages` (0-based) to `output_folder/page_N.<fmt>` with a document
+    handle of its own. Runs in a worker process.
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        return [_render_page(doc, i, output_folder, dpi, fmt) for i in pages]
+    finally:
+        doc.close()
+
+
+_pools: dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def default_workers() -> int:
+    return RASTER_PROCESSES or min(os.cpu_count() or 1, RASTER_MAX_PROCESSES)
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    # "spawn": the service runs threads (OCR workers, file sweeper) that a
+    # forked child would inherit in an arbitrary state.
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pools[workers] = pool
+        return pool
+
+
+def _discard_pool(workers: int) -> None:
+    with _pools_lock:
+        pool = _pools.pop(workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def shutdown() -> None:
+    """
+    Stop every worker process (they are started again on demand).
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_rendered(pdf_path: str, pages: Iterable[int], output_folder: str, dpi: int,
+                  fmt: str = "jpg", workers: int | None = None) -> Iterator[str]:
+    """
+    Render `pages` and yield their image paths in page order, each as soon
+    as it and every page before it are saved. Runs are submitted as earlier
+    ones are consumed, `workers` ahead at most.
+    """
+    pages = list(pages)
+    workers = workers or default_workers()
+    if workers < 2 or len(pages) < RASTER_MIN_PAGES:
+        yield from _iter_local(pdf_path, pages, output_folder, dpi, fmt)
+        return
+
+    # Short runs keep every worker busy and the first pages come back early
+    size = max(1, min(RASTER_CHUNK_PAGES, math.ceil(len(pages) / workers)))
+    runs = deque(pages[n:n + size] for n in range(0, len(pages), size))
+    futures = deque()
+    done = 0
+    try:
+        pool = _pool(workers)
+
+        def submit_next():
+            futures.append(pool.submit(render_range, pdf_path, runs.popleft(), output_folder, dpi, fmt))
+
+        while runs and len(futures) < workers:
+            submit_next()
+        while futures:
+            paths = futures.popleft().result()
+            done += len(paths)
+            # Replace the finished run before handing its pages over, so the
+            # workers stay busy while the consumer works through them.
+            if runs:
+                submit_next()
+            yield from paths
+    except BrokenProcessPool:
+        # A worker died (or couldn't start); finish here and give the next
+        # job a fresh pool.
+        _discard_pool(workers)
+        yield from _iter_local(pdf_path, pages[done:], output_folder, dpi, fmt)
+    finally:
+        for future in futures:
+            future.cancel()         # consumer stopped early
+
+
+def _iter_local(pdf_path: str, pages: list[int], output_folder: str, dpi: int, fmt: str) -> Iterator[str]:
+    doc = fitz.open(pdf_path)
+    try:
+        for i in pages:
+            yield _render_page(doc, i, output_folder, dpi, fmt)
+    finally:
+        doc.close()
@@ -1 +1,57 @@
-# Placeholder for ocr_service/utils/text_utils.py
+# utils/text_utils.py
+
+import re
+import unicodedata
+
+_ARABIC_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "01234567890123456789")
+_DIACRITICS = re.compile(r"[\u0640\u064B-\u065F\u0670]")  # tatweel + harakat
+
+
+def to_english_digits(text: str) -> str:
+    """
+    Replace Arabic-Indic and Persian digits with ASCII digits.
+    """
+    return text.translate(_ARABIC_DIGITS)
+
+
+def normalize_arabic(text: str) -> str:
+    """
+    Normalise text for keyword matching:
+      - NFKC folds presentation forms (as found in PDF text layers) to letters,
+      - tatweel and diacritics are dropped, alef/yeh/teh-marbuta variants unified,
+      - digits become ASCII, whitespace is collapsed and Latin is lower-cased.
+    """
+    text = unicodedata.normalize("NFKC", text)
+    text = _DIACRITICS.sub("", text)
+    text = re.sub("[إأآ]", "ا", text)
+    text = text.replace("ى", "ي").replace("ة", "ه")
+    text = to_english_digits(text)
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def visual_to_logical(text: str) -> str:
+    """
+    Undo the visual (right-to-left reversed) order PyMuPDF often returns for
+    Arabic lines: reverse the line, then restore the order inside numbers.
+    """
+    text = unicodedata.normalize("NFKC", text).replace("\xa0", " ")
+    logical = re.sub(r"\d[\d/.,-]*\d|\d", lambda m: m.group()[::-1], text[::-1])
+    # A number glued to the start of the line was trailing in logical order
+    logical = re.sub(r"^(\d[\d/.,-]*)(?=[^\d\s/.,-])(.*)$", r"\2 \1", logical)
+    return re.sub(r"\s+", " ", logical).strip()
+
+
+def contains_phrase(text: str, phrase: str) -> bool:
+    """
+    True if `phrase` occurs in already-normalised `text`, either in logical
+    order or reversed (text layers of some PDFs store Arabic visually).
+    """
+    phrase = normalize_arabic(phrase)
+    return phrase in text or phrase[::-1] in text
+
+
+def count_phrases(text: str, phrases: list[str]) -> int:
+    """
+    Number of `phrases` found in already-normalised `text`.
+    """
+    return sum(1 for p in phrases if contains_phrase(text, p))
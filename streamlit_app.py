@@ -1,13 +1,13 @@
 import streamlit as st
 from pathlib import Path
 import base64
-import fitz  # PyMuPDF
 import streamlit.components.v1 as components
 import tempfile
 import json
 
-from ocr_service.pipeline import process_document
+from ocr_service.pipeline import process_document, process_bundle
 from ocr_service.classifier import DocumentType
+from ocr_service.utils.pdf_utils import pdf_to_pngs
 
 st.set_page_config(page_title="OCR & Data Extraction", layout="wide")
 st.title("📄 OCR & Data Extraction")
@@ -15,6 +15,7 @@ st.write("Upload a PDF and get its classification and extracted data instantly."
 
 # File uploader
 uploaded_file = st.file_uploader("Choose a PDF file", type=["pdf"])
+is_bundle = st.checkbox("This PDF contains several documents (e.g. ID + tax card + registration)")
 
 if uploaded_file:
     # Only start processing when the user clicks
@@ -25,14 +26,12 @@ if uploaded_file:
             pdf_path = tmpdir / uploaded_file.name
             pdf_path.write_bytes(uploaded_file.getbuffer())
 
-            # Render PDF pages to base64-encoded PNGs
-            doc = fitz.open(stream=pdf_path.read_bytes(), filetype="pdf")
+            # Render PDF pages (1.5x zoom = 108 DPI) to base64-encoded PNGs,
+            # on the rasterizer's worker processes for long documents
             page_imgs = []
-            for page in doc:
-                pix = page.get_pixmap(matrix=fitz.Matrix(1.5, 1.5))
-                b64 = base64.b64encode(pix.tobytes("png")).decode("utf-8")
+            for png in pdf_to_pngs(str(pdf_path), dpi=108):
+                b64 = base64.b64encode(png).decode("utf-8")
                 page_imgs.append(f"data:image/png;base64,{b64}")
-            doc.close()
 
             n_pages = len(page_imgs)
             js_pages = json.dumps(page_imgs)
@@ -87,10 +86,23 @@ if uploaded_file:
 
             with col2:
                 st.subheader("Extraction Results")
-                with st.spinner("Classifying..."):
-                    doc_type = process_document.__globals__["classify_pdf"](str(pdf_path))
-                st.markdown(f"**Document Type:** `{doc_type.name}`")
+                if is_bundle:
+                    with st.spinner("Splitting and extracting..."):
+                        segments = process_bundle(str(pdf_path))
+                    for seg in segments:
+                        pages = f"{seg['pages'][0]}–{seg['pages'][-1]}"
+                        st.markdown(f"**Pages {pages}:** `{seg['document_type']}`")
+                        if "error" in seg:
+                            st.error(seg["error"])
+                        else:
+                            st.json(seg["result"])
+                    st.stop()
 
-                with st.spinner("Extracting..."):
+                # process_document classifies the PDF itself (pages go to a
+                # folder of its own) and records the type in the result's _meta
+                with st.spinner("Classifying and extracting..."):
                     result = process_document(str(pdf_path))
+                first = result[0] if isinstance(result, list) and result else result
+                doc_type = first.get("_meta", {}).get("document_type", "") if isinstance(first, dict) else ""
+                st.markdown(f"**Document Type:** `{doc_type}`")
                 st.json(result)